@@ -1,33 +1,193 @@
+import asyncio
+import csv
+import numpy as np
+import orjson
+import random
+import re
+import sqlite3
+import aiohttp
 import requests
-import xml.etree.ElementTree as ET
-import pandas as pd
+from lxml import etree as ET
 from typing import List, Dict, Optional, Tuple
 import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from email.utils import parsedate_to_datetime
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+try:
+    import pygixml  # Optional pugixml bindings, several times faster than lxml for efetch bodies
+except ImportError:
+    pygixml = None
+
+class RateLimiter:
+    """Token bucket shared by the esearch requests and the concurrent efetch requests"""
+    
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate (float): Tokens added per second
+            burst (int): Maximum number of tokens that can accumulate while idle
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        
+    def _reserve(self) -> float:
+        """
+        Take one token, borrowing from the future if the bucket is empty
+        
+        Returns:
+            float: Seconds the caller must wait before sending its request
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+            
+    def wait(self):
+        """Block until a request may be sent"""
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+            
+    async def wait_async(self):
+        """Suspend until a request may be sent without blocking the event loop"""
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
 class EnhancedPubMedSearcher:
-    def __init__(self, email: str = None):
+    # XPath expressions are compiled once and evaluated by libxml2; the text()
+    # queries return plain strings so no element proxies are created
+    _xp_query_translation = ET.XPath('(.//QueryTranslation)[1]/text()', smart_strings=False)
+    _xp_count = ET.XPath('(.//Count)[1]/text()', smart_strings=False)
+    _xp_ids = ET.XPath('.//IdList/Id/text()', smart_strings=False)
+    _xp_webenv = ET.XPath('(.//WebEnv)[1]/text()', smart_strings=False)
+    _xp_query_key = ET.XPath('(.//QueryKey)[1]/text()', smart_strings=False)
+    
+    # Elements read from a <PubmedArticle>, collected by parse_article_xml in one walk
+    _article_tags = ('PMID', 'ArticleTitle', 'AbstractText', 'Author', 'ELocationID', 'PubDate')
+    
+    # Article field queries compiled for pugixml, used when pygixml is installed
+    if pygixml is not None:
+        _pugi_articles = pygixml.XPathQuery('//PubmedArticle')
+        _pugi_pmid = pygixml.XPathQuery('(.//PMID)[1]/text()')
+        _pugi_title = pygixml.XPathQuery('(.//ArticleTitle)[1]/text()')
+        _pugi_abstract_texts = pygixml.XPathQuery('.//AbstractText')
+        _pugi_authors = pygixml.XPathQuery('.//Author[LastName]')
+        _pugi_doi = pygixml.XPathQuery('(.//ELocationID[@EIdType="doi"])[1]/text()')
+        _pugi_pub_date = pygixml.XPathQuery('(.//PubDate)[1]')
+    
+    _maintenance_re = re.compile(rb'maintenance|down_bethesda|302 found|document has moved', re.IGNORECASE)
+    
+    CSV_COLUMNS = ['PMID', 'Title', 'Abstract', 'Authors', 'DOI', 'Publication_Date', 'Year']
+    
+    # E-utilities compresses XML responses when asked; both HTTP clients decode transparently
+    ACCEPT_ENCODING = 'gzip, deflate'
+    
+    TOOL_NAME = 'meta-analysis-ai-backend'
+    
+    # Questions whose esearch results are kept, and seconds they are reused for. NCBI drops
+    # an idle WebEnv after a few hours, so an older result is searched again for a fresh one
+    QUERY_CACHE_SIZE = 32
+    QUERY_CACHE_TTL = 3600
+    
+    # Layout of the articles stored in the disk cache, kept in its PRAGMA user_version.
+    # Bump it whenever an article field changes shape; a cache in another layout is emptied
+    # (2: Authors is a list of names rather than one string)
+    CACHE_FORMAT_VERSION = 2
+    
+    # efetch statuses that mean "slow down" rather than a hard failure
+    THROTTLE_STATUSES = {429, 500, 502, 503, 504}
+    MAX_ATTEMPTS = 3
+    SUCCESSES_PER_INCREASE = 20
+    # Up to this many seconds are added at random to each fallback backoff
+    BACKOFF_JITTER = 0.5
+    
+    def __init__(self, email: str = None, max_concurrency: int = 3, article_cache_size: int = 2048,
+                 requests_per_second: float = 3.0, cache_path: Optional[str] = 'pubmed_cache.db'):
         """
         Initialize PubMed searcher with email for NCBI API access
         
         Args:
             email (str): Email for NCBI API (recommended for higher rate limits)
+            max_concurrency (int): Maximum number of efetch requests in flight at once
+                (NCBI allows 3 requests/second, 10 with an API key)
+            article_cache_size (int): Number of parsed articles kept in memory for re-display
+            requests_per_second (float): NCBI request budget shared by all requests
+                (3 without an API key, 10 with one)
+            cache_path (Optional[str]): SQLite file persisting parsed articles across
+                runs, or None to keep the cache in memory only
         """
         self.email = email
+        
+        # Identification sent with every E-utilities request; only a valid-looking email is sent
+        self._email_param = {'email': email, 'tool': self.TOOL_NAME} if email and '@' in email and '.' in email else {}
         self.base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+        self.max_concurrency = max_concurrency
+        self._xml_backend = 'pugi' if pygixml is not None else 'lxml'
+        
+        # AIMD controller: halve the efetch concurrency when NCBI pushes back,
+        # grow it again by one after a run of successful requests
+        self._concurrency = max_concurrency
+        self._consecutive_successes = 0
+        self._concurrency_lock = threading.Lock()
+        
+        self._rate_limiter = RateLimiter(requests_per_second, burst=max(1, int(requests_per_second)))
+        
+        # LRU cache of parsed articles keyed by PMID, and esearch results keyed by question
+        self.article_cache_size = article_cache_size
+        self._article_cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._article_cache_lock = threading.Lock()
+        self._query_cache: "OrderedDict[str, Tuple[float, Tuple[str, np.ndarray, int], Optional[Dict]]]" = OrderedDict()
+        
+        # Articles never change once published, so parsed ones are also kept on disk
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if cache_path:
+            self._db = sqlite3.connect(cache_path, check_same_thread=False)
+            if self._db.execute('PRAGMA user_version').fetchone()[0] != self.CACHE_FORMAT_VERSION:
+                self._db.execute('DROP TABLE IF EXISTS articles')
+                self._db.execute(f'PRAGMA user_version = {self.CACHE_FORMAT_VERSION}')
+            self._db.execute('CREATE TABLE IF NOT EXISTS articles(pmid TEXT PRIMARY KEY, data TEXT, ts INTEGER)')
+            self._db.commit()
+        
+        # History server handle (WebEnv, query_key, count) of the current search
+        self._search_history: Optional[Dict] = None
+        
+        # Background loading of the next page during interactive pagination
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._prefetch_start: Optional[int] = None
+        self._prefetch_future: Optional[Future] = None
+        
+        # Every article shown during pagination, keyed by PMID, for the save option
+        self._seen_articles: Dict[str, Dict] = {}
         
         # Set up session with retry strategy
         self.session = requests.Session()
+        # Waits as long as a 429/503 Retry-After asks, otherwise backs off with jitter so
+        # parallel fetches that failed together do not all retry together
         retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
+            total=5,
+            backoff_factor=0.5,
+            backoff_jitter=0.5,
             status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET'],
+            respect_retry_after_header=True,
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # Keep a warm pool so repeated esearch calls reuse one TLS connection
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retry_strategy)
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
+        self.session.headers.update({'Connection': 'keep-alive', 'Accept-Encoding': self.ACCEPT_ENCODING})
         
     def _is_valid_xml_response(self, response_content: bytes) -> bool:
         """
@@ -39,11 +199,11 @@ class EnhancedPubMedSearcher:
         Returns:
             bool: True if valid XML, False otherwise
         """
-        try:
-            content_str = response_content.decode('utf-8', errors='ignore').strip()
-            return content_str.startswith('<?xml') or content_str.startswith('<')
-        except Exception:
-            return False
+        # Only the first non-whitespace byte matters; a UTF-8 BOM may precede it
+        head = response_content[:64].lstrip()
+        if head.startswith(b'\xef\xbb\xbf'):
+            head = head[3:].lstrip()
+        return head.startswith(b'<')
             
     def _is_maintenance_page(self, response_content: bytes) -> bool:
         """
@@ -55,13 +215,14 @@ class EnhancedPubMedSearcher:
         Returns:
             bool: True if maintenance page, False otherwise
         """
-        try:
-            content_str = response_content.decode('utf-8', errors='ignore').lower()
-            return any(keyword in content_str for keyword in ['maintenance', 'down_bethesda', '302 found', 'document has moved'])
-        except Exception:
+        # Maintenance pages are short HTML documents, so the first 4KB is enough. E-utilities
+        # XML opens with a declaration, and its query text may itself mention "maintenance"
+        head = response_content[:4096]
+        if head.lstrip().lstrip(b'\xef\xbb\xbf').startswith(b'<?xml'):
             return False
+        return self._maintenance_re.search(head) is not None
         
-    def get_pubmed_query_translation(self, user_question: str) -> Tuple[str, List[str], int]:
+    def get_pubmed_query_translation(self, user_question: str) -> Tuple[str, np.ndarray, int]:
         """
         Get PubMed's query translation and all PMIDs
         
@@ -69,23 +230,36 @@ class EnhancedPubMedSearcher:
             user_question (str): User's research question
             
         Returns:
-            Tuple[str, List[str], int]: (translation, all_pmids, total_count)
+            Tuple[str, np.ndarray, int]: (translation, all_pmids as int64, total_count)
         """
+        cached = self._query_cache.get(user_question)
+        if cached and time.monotonic() - cached[0] < self.QUERY_CACHE_TTL:
+            self._query_cache.move_to_end(user_question)
+            _, result, self._search_history = cached
+            return result
+            
         print(f"🔍 Analyzing question: {user_question}")
         
-        # First, get total count and translation
+        # PMIDs are limited to 1000 for performance, but the total count is still shown
+        batch_size = 1000  # PubMed's max per request
+        max_results = 1000  # Limit to 1000 results for performance
+        
+        # The first request returns the count, the translation and the first batch of PMIDs,
+        # and stores the result set on the history server for efetch
         params = {
             'db': 'pubmed',
             'term': user_question,
             'retmode': 'xml',
-            'retmax': 0,  # Just get count and translation
-            'sort': 'relevance'
+            'retmax': min(batch_size, max_results),
+            'sort': 'relevance',
+            'usehistory': 'y',
+            **self._email_param
         }
-        # Only add email if it's a valid email format
-        if self.email and '@' in self.email and '.' in self.email:
-            params['email'] = self.email
+        # The WebEnv's age is counted from the search that created it
+        searched_at = time.monotonic()
             
         try:
+            self._rate_limiter.wait()
             response = self.session.get(f"{self.base_url}/esearch.fcgi", params=params, timeout=30)
             response.raise_for_status()
             
@@ -93,59 +267,74 @@ class EnhancedPubMedSearcher:
             if self._is_maintenance_page(response.content):
                 print("❌ NCBI E-utilities API is currently under maintenance or unavailable.")
                 print("   Please try again later or visit https://eutils.ncbi.nlm.nih.gov/ for status updates.")
-                return user_question, [], 0
+                return user_question, self._pmid_array([]), 0
                 
             # Check if response is valid XML
             if not self._is_valid_xml_response(response.content):
                 print(f"❌ API returned non-XML response: {response.text[:200]}...")
-                return user_question, [], 0
+                return user_question, self._pmid_array([]), 0
                 
             root = ET.fromstring(response.content)
         except requests.RequestException as e:
             print(f"❌ Network error: {e}")
-            return user_question, [], 0
-        except ET.ParseError as e:
+            return user_question, self._pmid_array([]), 0
+        except ET.XMLSyntaxError as e:
             print(f"❌ XML parsing error: {e}")
             print(f"Response content: {response.text[:500]}...")
-            return user_question, [], 0
+            return user_question, self._pmid_array([]), 0
         
         # Get translation
-        translation = root.findtext('.//QueryTranslation')
+        translations = self._xp_query_translation(root)
+        translation = translations[0] if translations else None
         if not translation:
             translation = user_question
             
         # Get total count
-        count_elem = root.find('.//Count')
-        total_count = int(count_elem.text) if count_elem is not None else 0
+        counts = self._xp_count(root)
+        total_count = int(counts[0]) if counts else 0
+        
+        # Get history server handle
+        webenvs = self._xp_webenv(root)
+        query_keys = self._xp_query_key(root)
+        if webenvs and query_keys:
+            self._search_history = {
+                'WebEnv': webenvs[0],
+                'query_key': query_keys[0],
+                'count': total_count
+            }
+        else:
+            self._search_history = None
         
         print(f"📊 Total papers found by PubMed: {total_count}")
         print(f"🔎 PubMed Query Translation:")
         print(f"   {translation}")
         
         if total_count == 0:
-            return translation, [], 0
+            return translation, self._pmid_array([]), 0
             
-        # Now get PMIDs (limited to 1000 for performance, but showing total count)
-        all_pmids = []
-        batch_size = 1000  # PubMed's max per request
-        max_results = 1000  # Limit to 1000 results for performance
-        
-        print(f"📄 Retrieving first {max_results} PMIDs (out of {total_count} total papers)...")
+        all_pmids = self._pmid_array(self._xp_ids(root))
+        print(f"📄 Retrieved PMIDs 1-{len(all_pmids)} of {min(total_count, max_results)}")
+        batches = [all_pmids]
         
-        for start in range(0, min(total_count, max_results), batch_size):
+        # Page through further batches only when the results exceed the first one
+        for start in range(len(all_pmids), min(total_count, max_results), batch_size):
             params = {
                 'db': 'pubmed',
-                'term': user_question,
                 'retmode': 'xml',
                 'retstart': start,
                 'retmax': min(batch_size, max_results - start),
-                'sort': 'relevance'
+                'sort': 'relevance',
+                **self._email_param
             }
-            # Only add email if it's a valid email format
-            if self.email and '@' in self.email and '.' in self.email:
-                params['email'] = self.email
+            # Page through the stored result set rather than re-running the query
+            if self._search_history:
+                params['WebEnv'] = self._search_history['WebEnv']
+                params['query_key'] = self._search_history['query_key']
+            else:
+                params['term'] = user_question
                 
             try:
+                self._rate_limiter.wait()
                 response = self.session.get(f"{self.base_url}/esearch.fcgi", params=params, timeout=30)
                 response.raise_for_status()
                 
@@ -153,7 +342,7 @@ class EnhancedPubMedSearcher:
                 if self._is_maintenance_page(response.content):
                     print("❌ NCBI E-utilities API is currently under maintenance or unavailable.")
                     print("   Please try again later or visit https://eutils.ncbi.nlm.nih.gov/ for status updates.")
-                    return translation, all_pmids, total_count
+                    return translation, np.concatenate(batches), total_count
                     
                 # Check if response is valid XML
                 if not self._is_valid_xml_response(response.content):
@@ -164,57 +353,185 @@ class EnhancedPubMedSearcher:
             except requests.RequestException as e:
                 print(f"❌ Network error: {e}")
                 continue
-            except ET.ParseError as e:
+            except ET.XMLSyntaxError as e:
                 print(f"❌ XML parsing error: {e}")
                 print(f"Response content: {response.text[:500]}...")
                 continue
             
-            batch_pmids = [id_elem.text for id_elem in root.findall('.//IdList/Id')]
-            all_pmids.extend(batch_pmids)
+            batch_pmids = self._pmid_array(self._xp_ids(root))
+            batches.append(batch_pmids)
             
             print(f"📄 Retrieved PMIDs {start+1}-{start+len(batch_pmids)} of {min(total_count, max_results)}")
             
-            # Rate limiting
-            time.sleep(0.1)
-            
+        all_pmids = np.concatenate(batches)
         print(f"✅ Retrieved {len(all_pmids)} PMIDs for pagination (out of {total_count} total papers found)")
         
+        self._query_cache[user_question] = (searched_at, (translation, all_pmids, total_count), self._search_history)
+        self._query_cache.move_to_end(user_question)
+        while len(self._query_cache) > self.QUERY_CACHE_SIZE:
+            self._query_cache.popitem(last=False)
         return translation, all_pmids, total_count
     
-    def fetch_article_details(self, pmids: List[str], start_idx: int = 0, count: int = 50) -> List[Dict]:
+    def fetch_article_details(self, pmids: np.ndarray, start_idx: int = 0, count: int = 50,
+                              verbose: bool = True) -> List[Dict]:
         """
         Fetch detailed information for a subset of PMIDs
         
         Args:
-            pmids (List[str]): List of all PMIDs
+            pmids (np.ndarray): All PMIDs of the search, as int64
             start_idx (int): Starting index for this batch
             count (int): Number of articles to fetch
+            verbose (bool): Print progress (disabled for background prefetches)
             
         Returns:
             List[Dict]: List of article dictionaries
         """
-        if not pmids:
+        if len(pmids) == 0:
             return []
             
-        # Get the subset of PMIDs for this batch
-        end_idx = min(start_idx + count, len(pmids))
-        batch_pmids = pmids[start_idx:end_idx]
+        # With a history server handle every result is reachable, not just the retrieved PMIDs
+        available = max(len(pmids), self._search_history['count']) if self._search_history else len(pmids)
+        end_idx = min(start_idx + count, available)
+        
+        if verbose:
+            print(f"📖 Fetching details for articles {start_idx+1}-{end_idx}...")
+        
+        # Pull articles seen in earlier runs from disk into the memory cache
+        self._load_cached_articles([str(pmid) for pmid in pmids[start_idx:min(end_idx, len(pmids))]])
+        
+        # Serve previously fetched articles from the cache and group the
+        # remaining positions into runs of consecutive misses
+        sub_batch_size = 20  # Process in smaller batches to avoid API limits
+        plan = []
+        run = []
+        for position in range(start_idx, end_idx):
+            article = self._get_cached_article(str(pmids[position])) if position < len(pmids) else None
+            if article is None:
+                run.append(position)
+                if len(run) == sub_batch_size:
+                    plan.append(run)
+                    run = []
+            else:
+                if run:
+                    plan.append(run)
+                    run = []
+                plan.append(article)
+        if run:
+            plan.append(run)
+        
+        # Fetch the misses concurrently, by result-set range when the history server is available
+        sub_batches = []
+        for item in plan:
+            if isinstance(item, list):
+                if self._search_history:
+                    sub_batches.append({
+                        'WebEnv': self._search_history['WebEnv'],
+                        'query_key': self._search_history['query_key'],
+                        'retstart': item[0],
+                        'retmax': len(item)
+                    })
+                else:
+                    sub_batches.append({'id': ','.join(str(pmids[position]) for position in item)})
         
-        print(f"📖 Fetching details for articles {start_idx+1}-{end_idx}...")
+        fetched = iter(asyncio.run(self._fetch_batches_async(sub_batches)) if sub_batches else [])
         
-        # Process in smaller batches to avoid API limits
         articles = []
-        sub_batch_size = 20
+        new_articles = []
+        for item in plan:
+            if isinstance(item, list):
+                for article in next(fetched):
+                    self._cache_article(article)
+                    new_articles.append(article)
+                    articles.append(article)
+            else:
+                articles.append(item)
+        self._store_articles(new_articles)
+                
+        return articles
+    
+    def _prefetch_page(self, pmids: np.ndarray, start_idx: int, count: int):
+        """Start loading a page in the background unless it is already being loaded"""
+        if self._prefetch_future is not None and self._prefetch_start == start_idx:
+            return
+        self._prefetch_start = start_idx
+        self._prefetch_future = self._executor.submit(self.fetch_article_details, pmids, start_idx, count, False)
+    
+    def _fetch_page(self, pmids: np.ndarray, start_idx: int, count: int) -> List[Dict]:
+        """Return a page, taking it from the background prefetch when that covers it"""
+        if self._prefetch_future is not None and self._prefetch_start == start_idx:
+            future, self._prefetch_future = self._prefetch_future, None
+            return future.result()
+        return self.fetch_article_details(pmids, start_idx, count)
+    
+    def _get_cached_article(self, pmid: str) -> Optional[Dict]:
+        """Return a cached article and mark it as recently used"""
+        with self._article_cache_lock:
+            article = self._article_cache.get(pmid)
+            if article is not None:
+                self._article_cache.move_to_end(pmid)
+            return article
+    
+    def _cache_article(self, article: Dict):
+        """Store an article, evicting the least recently used one when full"""
+        with self._article_cache_lock:
+            self._article_cache[article['PMID']] = article
+            self._article_cache.move_to_end(article['PMID'])
+            if len(self._article_cache) > self.article_cache_size:
+                self._article_cache.popitem(last=False)
+    
+    def _pmid_array(self, pmids: List[str]) -> np.ndarray:
+        """Pack PMIDs into an int64 array, 8 bytes each instead of a str object"""
+        return np.fromiter(map(int, pmids), dtype=np.int64, count=len(pmids))
+    
+    def _load_cached_articles(self, pmids: List[str]) -> Dict[str, Dict]:
+        """
+        Look PMIDs up in the memory cache, then in the on-disk cache
         
-        for i in range(0, len(batch_pmids), sub_batch_size):
-            sub_batch = batch_pmids[i:i + sub_batch_size]
-            sub_articles = self.fetch_batch_details(sub_batch)
-            articles.extend(sub_articles)
+        Args:
+            pmids (List[str]): PMIDs to look up
             
-            # Rate limiting
-            time.sleep(0.1)
+        Returns:
+            Dict[str, Dict]: Cached articles keyed by PMID
+        """
+        found = {}
+        missing = []
+        for pmid in pmids:
+            article = self._get_cached_article(pmid)
+            if article is None:
+                missing.append(pmid)
+            else:
+                found[pmid] = article
+                
+        if self._db is None or not missing:
+            return found
             
-        return articles
+        # Stay well below SQLite's limit on bound parameters
+        with self._db_lock:
+            rows = []
+            for i in range(0, len(missing), 500):
+                chunk = missing[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows.extend(self._db.execute(
+                    f'SELECT data FROM articles WHERE pmid IN ({placeholders})', chunk
+                ).fetchall())
+                
+        for (data,) in rows:
+            article = orjson.loads(data)
+            self._cache_article(article)
+            found[article['PMID']] = article
+        return found
+    
+    def _store_articles(self, articles: List[Dict]):
+        """Persist newly fetched articles to the on-disk cache"""
+        if self._db is None or not articles:
+            return
+        now = int(time.time())
+        with self._db_lock:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO articles(pmid, data, ts) VALUES (?, ?, ?)',
+                [(article['PMID'], orjson.dumps(article), now) for article in articles]
+            )
+            self._db.commit()
     
     def fetch_batch_details(self, pmids: List[str]) -> List[Dict]:
         """
@@ -229,45 +546,198 @@ class EnhancedPubMedSearcher:
         if not pmids:
             return []
             
+        # Only the PMIDs missing from the caches go over the network
+        cached = self._load_cached_articles(pmids)
+        missing = [pmid for pmid in pmids if pmid not in cached]
+        if not missing:
+            return [cached[pmid] for pmid in pmids]
+            
+        fetched = asyncio.run(self._fetch_batches_async([{'id': ','.join(missing)}]))[0]
+        for article in fetched:
+            self._cache_article(article)
+        self._store_articles(fetched)
+        
+        if not cached:
+            return fetched
+        articles = {**cached, **{article['PMID']: article for article in fetched}}
+        return [articles[pmid] for pmid in pmids if pmid in articles]
+    
+    async def _fetch_batches_async(self, sub_batches: List[Dict]) -> List[List[Dict]]:
+        """
+        Fetch several sub-batches concurrently over one pooled aiohttp session
+        
+        Args:
+            sub_batches (List[Dict]): efetch selection params (an 'id' list or a
+                WebEnv/query_key/retstart/retmax range), one efetch call each
+            
+        Returns:
+            List[List[Dict]]: Articles of each sub-batch, in the original order
+        """
+        semaphore = asyncio.Semaphore(self._concurrency)
+        connector = aiohttp.TCPConnector(limit_per_host=8, keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(total=30)
+        
+        headers = {'Accept-Encoding': self.ACCEPT_ENCODING}
+        
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+            return await asyncio.gather(
+                *(self._fetch_batch_async(session, semaphore, sub_batch) for sub_batch in sub_batches)
+            )
+    
+    async def _fetch_batch_async(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                                 selection: Dict) -> List[Dict]:
+        """
+        Fetch details for a batch of articles
+        
+        Args:
+            session (aiohttp.ClientSession): Shared HTTP session
+            semaphore (asyncio.Semaphore): Bounds the number of concurrent requests
+            selection (Dict): Either {'id': comma-separated PMIDs} or a history
+                server range {'WebEnv', 'query_key', 'retstart', 'retmax'}
+            
+        Returns:
+            List[Dict]: List of article details
+        """
         params = {
             'db': 'pubmed',
-            'id': ','.join(pmids),
             'retmode': 'xml',
-            'rettype': 'abstract'
+            'rettype': 'abstract',
+            **selection,
+            **self._email_param
         }
-        # Only add email if it's a valid email format
-        if self.email and '@' in self.email and '.' in self.email:
-            params['email'] = self.email
             
         try:
-            response = self.session.get(f"{self.base_url}/efetch.fcgi", params=params, timeout=30)
-            response.raise_for_status()
-            
-            # Check if response is a maintenance page
-            if self._is_maintenance_page(response.content):
-                print("❌ NCBI E-utilities API is currently under maintenance or unavailable.")
-                print("   Please try again later or visit https://eutils.ncbi.nlm.nih.gov/ for status updates.")
-                return []
-                
-            # Check if response is valid XML
-            if not self._is_valid_xml_response(response.content):
-                print(f"❌ API returned non-XML response: {response.text[:200]}...")
-                return []
-                
-            root = ET.fromstring(response.content)
-            
-            articles = []
-            for article_elem in root.findall('.//PubmedArticle'):
-                article = self.parse_article_xml(article_elem)
-                if article:
-                    articles.append(article)
+            async with semaphore:
+                for attempt in range(self.MAX_ATTEMPTS):
+                    await self._rate_limiter.wait_async()
+                    async with session.get(f"{self.base_url}/efetch.fcgi", params=params) as response:
+                        if response.status in self.THROTTLE_STATUSES:
+                            # Back off as instructed by NCBI and shrink the pool for later pages
+                            self._on_throttled()
+                            delay = self._retry_after_delay(response.headers.get('Retry-After'), attempt)
+                            print(f"⚠️ NCBI returned {response.status}, retrying in {delay:.1f}s")
+                            await asyncio.sleep(delay)
+                            continue
+                        response.raise_for_status()
+                        
+                        if self._xml_backend == 'pugi':
+                            # pugixml parses the whole document at once, far faster than streaming
+                            body = await response.read()
+                            if not self._is_parsable_response(body[:4096]):
+                                return []
+                            articles = self._parse_with_pugi(body)
+                        else:
+                            # Parse the body while it downloads, one <PubmedArticle> at a time
+                            parser = ET.XMLPullParser(events=('end',), tag='PubmedArticle')
+                            articles = []
+                            head = b''
+                            async for chunk in response.content.iter_chunked(64 * 1024):
+                                if head is not None:
+                                    # Buffer the start of the body so it can be checked before parsing
+                                    head += chunk
+                                    if len(head) < 4096:
+                                        continue
+                                    if not self._is_parsable_response(head):
+                                        return []
+                                    chunk, head = head, None
+                                parser.feed(chunk)
+                                self._collect_articles(parser, articles)
+                            
+                            if head is not None:
+                                if not self._is_parsable_response(head):
+                                    return []
+                                parser.feed(head)
+                            parser.close()
+                            self._collect_articles(parser, articles)
+                        
+                    self._on_success()
+                    return articles
                     
-            return articles
+            print(f"❌ Error fetching batch details: still throttled after {self.MAX_ATTEMPTS} attempts")
+            return []
             
         except Exception as e:
             print(f"❌ Error fetching batch details: {e}")
             return []
     
+    def _retry_after_delay(self, retry_after: Optional[str], attempt: int) -> float:
+        """
+        Work out how long to wait before retrying a throttled request
+        
+        Args:
+            retry_after (Optional[str]): Retry-After header, in seconds or as an HTTP date
+            attempt (int): Zero-based attempt number, used for the fallback backoff
+            
+        Returns:
+            float: Delay in seconds, jittered when NCBI gave none
+        """
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+            try:
+                retry_at = parsedate_to_datetime(retry_after)
+                return max(0.0, (retry_at - datetime.now(retry_at.tzinfo)).total_seconds())
+            except (TypeError, ValueError):
+                pass
+        return 2 ** attempt + random.uniform(0, self.BACKOFF_JITTER)
+    
+    def _on_throttled(self):
+        """Multiplicatively decrease the efetch concurrency after a 429/5xx"""
+        with self._concurrency_lock:
+            self._concurrency = max(1, self._concurrency // 2)
+            self._consecutive_successes = 0
+            
+    def _on_success(self):
+        """Additively increase the efetch concurrency after a run of successful requests"""
+        with self._concurrency_lock:
+            self._consecutive_successes += 1
+            if self._consecutive_successes >= self.SUCCESSES_PER_INCREASE:
+                self._concurrency = min(self.max_concurrency, self._concurrency + 1)
+                self._consecutive_successes = 0
+    
+    def _is_parsable_response(self, response_head: bytes) -> bool:
+        """
+        Check the start of an efetch body before handing it to the parser
+        
+        Args:
+            response_head (bytes): First bytes of the response body
+            
+        Returns:
+            bool: True if the body looks like XML article data, False otherwise
+        """
+        # Check if response is a maintenance page
+        if self._is_maintenance_page(response_head):
+            print("❌ NCBI E-utilities API is currently under maintenance or unavailable.")
+            print("   Please try again later or visit https://eutils.ncbi.nlm.nih.gov/ for status updates.")
+            return False
+            
+        # Check if response is valid XML
+        if not self._is_valid_xml_response(response_head):
+            print(f"❌ API returned non-XML response: {response_head[:200].decode('utf-8', errors='ignore')}...")
+            return False
+            
+        return True
+    
+    def _collect_articles(self, parser, articles: List[Dict]):
+        """
+        Parse every <PubmedArticle> completed so far and free its subtree
+        
+        Args:
+            parser: lxml XMLPullParser fed with the efetch body
+            articles (List[Dict]): Parsed articles are appended here
+        """
+        for _, article_elem in parser.read_events():
+            article = self.parse_article_xml(article_elem)
+            if article:
+                articles.append(article)
+                
+            # Drop the finished element and its already-parsed siblings
+            article_elem.clear()
+            while article_elem.getprevious() is not None:
+                del article_elem.getparent()[0]
+    
     def parse_article_xml(self, article_elem) -> Optional[Dict]:
         """
         Parse individual article XML element into structured dictionary
@@ -279,21 +749,106 @@ class EnhancedPubMedSearcher:
             Optional[Dict]: Parsed article data or None if parsing fails
         """
         try:
-            article_data = {}
+            pmid = title = doi = pub_date_elem = None
+            abstract_texts = []
+            authors = []
             
-            # Extract PMID
-            pmid_elem = article_elem.find('.//PMID')
-            article_data['PMID'] = pmid_elem.text if pmid_elem is not None else 'Unknown'
+            # A single walk over the article subtree; lxml skips the other tags in C
+            for elem in article_elem.iter(*self._article_tags):
+                tag = elem.tag
+                if tag == 'PMID':
+                    # Cited articles carry PMIDs too, the article's own comes first
+                    if pmid is None:
+                        pmid = elem.text
+                elif tag == 'ArticleTitle':
+                    if title is None:
+                        title = elem.text
+                elif tag == 'AbstractText':
+                    label = elem.get('Label', '')
+                    text = elem.text if elem.text else ''
+                    if label:
+                        abstract_texts.append(f"{label}: {text}")
+                    else:
+                        abstract_texts.append(text)
+                elif tag == 'Author':
+                    lastname = elem.findtext('LastName')
+                    if lastname is not None:
+                        forename = elem.findtext('ForeName', '')
+                        authors.append(f"{forename} {lastname}".strip())
+                elif tag == 'ELocationID':
+                    if doi is None and elem.get('EIdType') == 'doi':
+                        doi = elem.text
+                elif pub_date_elem is None:
+                    pub_date_elem = elem
             
-            # Extract title
-            title_elem = article_elem.find('.//ArticleTitle')
-            article_data['Title'] = title_elem.text if title_elem is not None else 'No title available'
+            article_data = {
+                'PMID': pmid or 'Unknown',
+                'Title': title or 'No title available',
+                'Abstract': ' '.join(abstract_texts) if abstract_texts else 'No abstract available',
+                # Kept as a list; joined only when displayed or written to CSV
+                'Authors': authors,
+                'DOI': doi or 'No DOI available'
+            }
+            
+            # Extract publication date
+            if pub_date_elem is not None:
+                year = pub_date_elem.findtext('Year', '')
+                month = pub_date_elem.findtext('Month', '')
+                day = pub_date_elem.findtext('Day', '')
+                
+                article_data['Publication_Date'] = f"{year}-{month}-{day}".strip('-')
+                article_data['Year'] = year
+            else:
+                article_data['Publication_Date'] = 'Date not available'
+                article_data['Year'] = 'Unknown'
+            
+            return article_data
+            
+        except Exception as e:
+            print(f"❌ Error parsing article XML: {str(e)}")
+            return None
+    
+    def _parse_with_pugi(self, xml_bytes: bytes) -> List[Dict]:
+        """
+        Parse a complete efetch body with pugixml
+        
+        Args:
+            xml_bytes (bytes): efetch response body
+            
+        Returns:
+            List[Dict]: Parsed articles, with the same fields as parse_article_xml
+        """
+        document = pygixml.parse_string(xml_bytes.decode('utf-8'))
+        articles = []
+        for article_node in self._pugi_articles.evaluate_node_set(document.root):
+            article = self._parse_article_pugi(article_node.node)
+            if article:
+                articles.append(article)
+        return articles
+    
+    def _parse_article_pugi(self, article_node) -> Optional[Dict]:
+        """
+        Parse a pugixml <PubmedArticle> node into structured dictionary
+        
+        Args:
+            article_node: pygixml node containing article data
+            
+        Returns:
+            Optional[Dict]: Parsed article data or None if parsing fails
+        """
+        try:
+            article_data = {}
+            
+            # Extract PMID and title
+            article_data['PMID'] = self._pugi_pmid.evaluate_string(article_node) or 'Unknown'
+            article_data['Title'] = self._pugi_title.evaluate_string(article_node) or 'No title available'
             
             # Extract abstract
             abstract_texts = []
-            for abstract_elem in article_elem.findall('.//AbstractText'):
-                label = abstract_elem.get('Label', '')
-                text = abstract_elem.text if abstract_elem.text else ''
+            for abstract_node in self._pugi_abstract_texts.evaluate_node_set(article_node):
+                abstract_elem = abstract_node.node
+                label = abstract_elem.attribute('Label').value or ''
+                text = abstract_elem.child_value() or ''
                 if label:
                     abstract_texts.append(f"{label}: {text}")
                 else:
@@ -303,31 +858,24 @@ class EnhancedPubMedSearcher:
             
             # Extract authors
             authors = []
-            for author_elem in article_elem.findall('.//Author'):
-                lastname_elem = author_elem.find('LastName')
-                forename_elem = author_elem.find('ForeName')
-                
-                if lastname_elem is not None:
-                    lastname = lastname_elem.text
-                    forename = forename_elem.text if forename_elem is not None else ''
-                    authors.append(f"{forename} {lastname}".strip())
+            for author_node in self._pugi_authors.evaluate_node_set(article_node):
+                author_elem = author_node.node
+                lastname = author_elem.child('LastName').child_value() or ''
+                forename = author_elem.child('ForeName').child_value() or ''
+                authors.append(f"{forename} {lastname}".strip())
             
-            article_data['Authors'] = ', '.join(authors) if authors else 'Authors not available'
+            # Kept as a list; joined only when displayed or written to CSV
+            article_data['Authors'] = authors
             
             # Extract DOI
-            doi_elem = article_elem.find('.//ELocationID[@EIdType="doi"]')
-            article_data['DOI'] = doi_elem.text if doi_elem is not None else 'No DOI available'
+            article_data['DOI'] = self._pugi_doi.evaluate_string(article_node) or 'No DOI available'
             
             # Extract publication date
-            pub_date_elem = article_elem.find('.//PubDate')
-            if pub_date_elem is not None:
-                year_elem = pub_date_elem.find('Year')
-                month_elem = pub_date_elem.find('Month')
-                day_elem = pub_date_elem.find('Day')
-                
-                year = year_elem.text if year_elem is not None else ''
-                month = month_elem.text if month_elem is not None else ''
-                day = day_elem.text if day_elem is not None else ''
+            pub_date_elem = self._pugi_pub_date.evaluate_node(article_node).node
+            if not pub_date_elem.is_null():
+                year = pub_date_elem.child('Year').child_value() or ''
+                month = pub_date_elem.child('Month').child_value() or ''
+                day = pub_date_elem.child('Day').child_value() or ''
                 
                 article_data['Publication_Date'] = f"{year}-{month}-{day}".strip('-')
                 article_data['Year'] = year
@@ -352,26 +900,58 @@ class EnhancedPubMedSearcher:
             print("❌ No articles to display")
             return
             
-        # Create DataFrame for better display
-        df = pd.DataFrame(articles)
-        
-        # Reorder columns
-        columns_order = ['PMID', 'Title', 'Authors', 'Year', 'DOI', 'Abstract']
-        df = df.reindex(columns=columns_order)
-        
         print(f"\n📋 Results Table ({len(articles)} articles):")
         print("="*120)
         
         # Display each article
-        for idx, row in df.iterrows():
-            print(f"\n{idx+1}. PMID: {row['PMID']}")
-            print(f"   Title: {row['Title']}")
-            print(f"   Authors: {row['Authors']}")
-            print(f"   Year: {row['Year']}")
-            print(f"   DOI: {row['DOI']}")
-            print(f"   Abstract: {row['Abstract'][:300]}...")
+        for idx, article in enumerate(articles, 1):
+            print(f"\n{idx}. PMID: {article.get('PMID', '')}")
+            print(f"   Title: {article.get('Title', '')}")
+            print(f"   Authors: {self._format_authors(article.get('Authors'))}")
+            print(f"   Year: {article.get('Year', '')}")
+            print(f"   DOI: {article.get('DOI', '')}")
+            print(f"   Abstract: {(article.get('Abstract') or '')[:300]}...")
             print("-" * 80)
     
+    def _format_authors(self, authors: Optional[List[str]]) -> str:
+        """Join an article's author list for display"""
+        return ', '.join(authors) if authors else 'Authors not available'
+    
+    def save_results(self, articles: List[Dict], filename: str):
+        """
+        Write articles to disk, as JSON Lines for a .jsonl filename and as CSV otherwise
+        
+        Args:
+            articles (List[Dict]): Articles to save
+            filename (str): Output path
+        """
+        if filename.lower().endswith('.jsonl'):
+            with open(filename, 'wb') as f:
+                f.writelines(orjson.dumps(article, option=orjson.OPT_APPEND_NEWLINE) for article in articles)
+        else:
+            self.save_results_csv(articles, filename)
+    
+    def save_results_csv(self, articles: List[Dict], filename: str):
+        """
+        Write articles to a CSV file
+        
+        Args:
+            articles (List[Dict]): Articles to save
+            filename (str): Output CSV path
+        """
+        with open(filename, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=self.CSV_COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(
+                {**article, 'Authors': self._format_authors(article.get('Authors'))} for article in articles
+            )
+    
+    def _show_page(self, articles: List[Dict]):
+        """Display a page of results and remember its articles for saving"""
+        self.display_results_table(articles)
+        for article in articles:
+            self._seen_articles[article['PMID']] = article
+    
     def run_paginated_search(self, user_question: str):
         """
         Run the complete paginated search workflow
@@ -389,10 +969,12 @@ class EnhancedPubMedSearcher:
             print("❌ No papers found for this query.")
             return
         
+        self._seen_articles = {}
+        
         # Step 2: Display first 50 results
         print(f"\n📄 Displaying first 50 results (sorted by relevance):")
         first_50_articles = self.fetch_article_details(all_pmids, 0, 50)
-        self.display_results_table(first_50_articles)
+        self._show_page(first_50_articles)
         
         # Step 3: Pagination for remaining results
         if total_count > 50:
@@ -403,11 +985,15 @@ class EnhancedPubMedSearcher:
             page_size = 50
             
             while True:
+                # Load the next page while the user is reading this one
+                if current_start < total_count:
+                    self._prefetch_page(all_pmids, current_start, page_size)
+                    
                 print(f"\nNavigation options:")
                 print(f"  [n] Next {page_size} results (currently showing 1-{current_start})")
                 print(f"  [p] Previous {page_size} results")
                 print(f"  [j] Jump to specific page")
-                print(f"  [s] Save current results to CSV")
+                print(f"  [s] Save current results to CSV (or JSON Lines)")
                 print(f"  [q] Quit")
                 
                 choice = input("\nEnter choice: ").lower().strip()
@@ -416,8 +1002,8 @@ class EnhancedPubMedSearcher:
                     break
                 elif choice == 'n':
                     if current_start < total_count:
-                        next_articles = self.fetch_article_details(all_pmids, current_start, page_size)
-                        self.display_results_table(next_articles)
+                        next_articles = self._fetch_page(all_pmids, current_start, page_size)
+                        self._show_page(next_articles)
                         current_start += page_size
                     else:
                         print("❌ No more results to show.")
@@ -425,7 +1011,7 @@ class EnhancedPubMedSearcher:
                     if current_start > 50:
                         current_start = max(50, current_start - page_size)
                         prev_articles = self.fetch_article_details(all_pmids, current_start - page_size, page_size)
-                        self.display_results_table(prev_articles)
+                        self._show_page(prev_articles)
                     else:
                         print("❌ Already at the beginning.")
                 elif choice == 'j':
@@ -435,20 +1021,18 @@ class EnhancedPubMedSearcher:
                             start_idx = (page_num - 1) * page_size
                             current_start = start_idx + page_size
                             jump_articles = self.fetch_article_details(all_pmids, start_idx, page_size)
-                            self.display_results_table(jump_articles)
+                            self._show_page(jump_articles)
                         else:
                             print("❌ Invalid page number!")
                     except ValueError:
                         print("❌ Invalid input!")
                 elif choice == 's':
-                    filename = input("Enter filename (default: pubmed_results.csv): ").strip()
+                    filename = input("Enter filename (default: pubmed_results.csv, use .jsonl for JSON Lines): ").strip()
                     if not filename:
                         filename = "pubmed_results.csv"
                     
-                    # Save all fetched results so far
-                    all_fetched = self.fetch_article_details(all_pmids, 0, min(current_start, total_count))
-                    df = pd.DataFrame(all_fetched)
-                    df.to_csv(filename, index=False)
+                    # Save every article shown so far without fetching anything again
+                    self.save_results(list(self._seen_articles.values()), filename)
                     print(f"✅ Results saved to {filename}")
                 else:
                     print("❌ Invalid choice!")
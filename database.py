@@ -1,4 +1,7 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -8,14 +11,44 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./meta_analysis.db")
 
+# Connection pool for server databases: room for concurrent pipeline clients, a hot
+# connection reused first, and stale connections checked or recycled before use
+POOL_OPTIONS = {
+    "pool_size": 20,
+    "max_overflow": 20,
+    "pool_pre_ping": True,
+    "pool_recycle": 1800,
+    "pool_use_lifo": True
+}
+
 # Use SQLite for development if PostgreSQL URL not provided
 if DATABASE_URL.startswith("postgresql://username"):
     DATABASE_URL = "sqlite:///./meta_analysis.db"
     engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-else:
+elif make_url(DATABASE_URL).get_backend_name() == "sqlite":
     engine = create_engine(DATABASE_URL)
+else:
+    engine = create_engine(DATABASE_URL, **POOL_OPTIONS)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# The same database through its asyncio driver, for routes that must not block the event loop
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+async_url = make_url(DATABASE_URL)
+async_url = async_url.set(drivername=ASYNC_DRIVERS.get(async_url.get_backend_name(), async_url.drivername))
+if async_url.get_backend_name() == "postgresql":
+    # Keep prepared statements for the repeated ORM queries on each connection
+    async_engine = create_async_engine(
+        async_url,
+        connect_args={"prepared_statement_cache_size": 256, "statement_cache_size": 256},
+        **POOL_OPTIONS
+    )
+elif async_url.get_backend_name() == "sqlite":
+    async_engine = create_async_engine(async_url)
+else:
+    async_engine = create_async_engine(async_url, **POOL_OPTIONS)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 def get_db():
@@ -23,4 +56,14 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def dialect_insert(db):
+    """Return the INSERT construct for the session's database, which supports ON CONFLICT"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql_insert
+    return sqlite_insert
\ No newline at end of file
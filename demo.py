@@ -4,33 +4,58 @@ Demo script to test the Meta-Analysis AI Backend API
 This script demonstrates the complete workflow from research question to final report
 """
 
-import requests
+import asyncio
+import aiohttp
 import json
+import orjson
 import time
 import sys
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 
 class MetaAnalysisDemo:
+    # Responses retried with exponential backoff, honoring Retry-After. A POST may already
+    # have taken effect behind a 5xx, so it is only retried when the server turned it away
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    POST_RETRY_STATUSES = {429, 503}
+    MAX_RETRIES = 5
+    BACKOFF_FACTOR = 0.5
+    
     def __init__(self, base_url: str = "http://localhost:8000"):
         self.base_url = base_url
-        self.session = requests.Session()
+        self.session: Optional[aiohttp.ClientSession] = None
         self.question_id = None
-        
-    def test_health(self) -> bool:
+    
+    async def _request(self, method: str, path: str, **kwargs) -> Tuple[int, bytes]:
+        """Send a request over the shared session, riding out transient failures"""
+        retry_statuses = self.POST_RETRY_STATUSES if method == "POST" else self.RETRY_STATUSES
+        for attempt in range(self.MAX_RETRIES + 1):
+            async with self.session.request(method, f"{self.base_url}{path}", **kwargs) as response:
+                body = await response.read()
+                if response.status not in retry_statuses or attempt == self.MAX_RETRIES:
+                    return response.status, body
+                retry_after = response.headers.get("Retry-After", "")
+            
+            try:
+                delay = max(float(retry_after), 0.0)
+            except ValueError:
+                delay = self.BACKOFF_FACTOR * (2 ** attempt)
+            await asyncio.sleep(delay)
+    
+    async def test_health(self) -> bool:
         """Test if the API is running"""
         try:
-            response = self.session.get(f"{self.base_url}/health")
-            if response.status_code == 200:
+            status, body = await self._request("GET", "/health")
+            if status == 200:
                 print("✅ API is healthy and running")
                 return True
             else:
-                print(f"❌ API health check failed: {response.status_code}")
+                print(f"❌ API health check failed: {status}")
                 return False
         except Exception as e:
             print(f"❌ Could not connect to API: {e}")
             return False
     
-    def create_research_question(self) -> Dict[str, Any]:
+    async def create_research_question(self) -> Dict[str, Any]:
         """Step 1: Create a research question with PICO criteria"""
         print("\n🔬 Step 1: Creating Research Question")
         
@@ -45,28 +70,25 @@ class MetaAnalysisDemo:
         }
         
         try:
-            response = self.session.post(
-                f"{self.base_url}/api/research-question",
-                json=payload
-            )
+            status, body = await self._request("POST", "/api/research-question", json=payload)
             
-            if response.status_code == 200:
-                data = response.json()
+            if status == 200:
+                data = orjson.loads(body)
                 self.question_id = data["question_id"]
                 print(f"✅ Research question created with ID: {self.question_id}")
                 print(f"📝 Original: {payload['question']}")
                 print(f"🔄 Rephrased: {data['rephrased_question']}")
                 return data
             else:
-                print(f"❌ Failed to create research question: {response.status_code}")
-                print(f"Response: {response.text}")
+                print(f"❌ Failed to create research question: {status}")
+                print(f"Response: {body.decode(errors='replace')}")
                 return {}
-                
+        
         except Exception as e:
             print(f"❌ Error creating research question: {e}")
             return {}
     
-    def search_pubmed(self, max_results: int = 20) -> Dict[str, Any]:
+    async def search_pubmed(self, max_results: int = 20) -> Dict[str, Any]:
         """Step 2: Search PubMed for relevant papers"""
         print(f"\n🔍 Step 2: Searching PubMed (max {max_results} results)")
         
@@ -75,16 +97,17 @@ class MetaAnalysisDemo:
             return {}
         
         try:
-            response = self.session.get(
-                f"{self.base_url}/api/pubmed-search",
+            status, body = await self._request(
+                "GET",
+                "/api/pubmed-search",
                 params={
                     "question_id": self.question_id,
                     "max_results": max_results
                 }
             )
             
-            if response.status_code == 200:
-                data = response.json()
+            if status == 200:
+                data = orjson.loads(body)
                 print(f"✅ Found {len(data['papers'])} papers (out of {data['total_count']} total)")
                 print(f"🔎 Query translation: {data['query_translation'][:100]}...")
                 
@@ -94,15 +117,15 @@ class MetaAnalysisDemo:
                 
                 return data
             else:
-                print(f"❌ Failed to search PubMed: {response.status_code}")
-                print(f"Response: {response.text}")
+                print(f"❌ Failed to search PubMed: {status}")
+                print(f"Response: {body.decode(errors='replace')}")
                 return {}
-                
+        
         except Exception as e:
             print(f"❌ Error searching PubMed: {e}")
             return {}
     
-    def screen_papers(self, papers_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def screen_papers(self, papers_data: Dict[str, Any]) -> Dict[str, Any]:
         """Step 3: Screen papers using AI"""
         print(f"\n🤖 Step 3: AI Screening Papers")
         
@@ -125,13 +148,10 @@ class MetaAnalysisDemo:
         }
         
         try:
-            response = self.session.post(
-                f"{self.base_url}/api/screening-columns",
-                json=payload
-            )
+            status, body = await self._request("POST", "/api/screening-columns", json=payload)
             
-            if response.status_code == 200:
-                data = response.json()
+            if status == 200:
+                data = orjson.loads(body)
                 print(f"✅ Screened {len(data['screened_papers'])} papers")
                 
                 # Show screening results
@@ -144,29 +164,30 @@ class MetaAnalysisDemo:
                 
                 return data
             else:
-                print(f"❌ Failed to screen papers: {response.status_code}")
-                print(f"Response: {response.text}")
+                print(f"❌ Failed to screen papers: {status}")
+                print(f"Response: {body.decode(errors='replace')}")
                 return {}
-                
+        
         except Exception as e:
             print(f"❌ Error screening papers: {e}")
             return {}
     
-    def get_filtered_papers(self, min_score: float = 3.0) -> Dict[str, Any]:
+    async def get_filtered_papers(self, min_score: float = 3.0) -> Dict[str, Any]:
         """Step 4: Get filtered papers above score threshold"""
         print(f"\n📊 Step 4: Getting Filtered Papers (score ≥ {min_score})")
         
         try:
-            response = self.session.get(
-                f"{self.base_url}/api/filtered-papers",
+            status, body = await self._request(
+                "GET",
+                "/api/filtered-papers",
                 params={
                     "question_id": self.question_id,
                     "min_score": min_score
                 }
             )
             
-            if response.status_code == 200:
-                data = response.json()
+            if status == 200:
+                data = orjson.loads(body)
                 print(f"✅ Found {len(data)} filtered papers")
                 
                 for paper in data[:3]:
@@ -174,14 +195,14 @@ class MetaAnalysisDemo:
                 
                 return {"papers": data}
             else:
-                print(f"❌ Failed to get filtered papers: {response.status_code}")
+                print(f"❌ Failed to get filtered papers: {status}")
                 return {}
-                
+        
         except Exception as e:
             print(f"❌ Error getting filtered papers: {e}")
             return {}
     
-    def extract_data(self, filtered_papers: Dict[str, Any]) -> Dict[str, Any]:
+    async def extract_data(self, filtered_papers: Dict[str, Any]) -> Dict[str, Any]:
         """Step 5: Extract structured data from top papers"""
         print(f"\n📝 Step 5: Extracting Structured Data")
         
@@ -197,13 +218,10 @@ class MetaAnalysisDemo:
         }
         
         try:
-            response = self.session.post(
-                f"{self.base_url}/api/extract-data",
-                json=payload
-            )
+            status, body = await self._request("POST", "/api/extract-data", json=payload)
             
-            if response.status_code == 200:
-                data = response.json()
+            if status == 200:
+                data = orjson.loads(body)
                 print(f"✅ Extracted data from {len(data['extracted_data'])} papers")
                 
                 for extraction in data['extracted_data'][:2]:
@@ -213,52 +231,54 @@ class MetaAnalysisDemo:
                 
                 return data
             else:
-                print(f"❌ Failed to extract data: {response.status_code}")
+                print(f"❌ Failed to extract data: {status}")
                 return {}
-                
+        
         except Exception as e:
             print(f"❌ Error extracting data: {e}")
             return {}
     
-    def generate_report(self, format: str = "csv") -> Dict[str, Any]:
+    async def generate_report(self, format: str = "csv") -> Dict[str, Any]:
         """Step 6: Generate final report"""
         print(f"\n📊 Step 6: Generating {format.upper()} Report")
         
         try:
-            response = self.session.get(
-                f"{self.base_url}/api/generate-report",
+            status, body = await self._request(
+                "GET",
+                "/api/generate-report",
                 params={
                     "question_id": self.question_id,
                     "format": format,
                     "min_score": 2.0,
-                    "include_all": True
+                    "include_all": "true"
                 }
             )
             
-            if response.status_code == 200:
-                data = response.json()
+            if status == 200:
+                data = orjson.loads(body)
                 print(f"✅ Report generated: {data['report_url']}")
                 return data
             else:
-                print(f"❌ Failed to generate report: {response.status_code}")
+                print(f"❌ Failed to generate report: {status}")
                 return {}
-                
+        
         except Exception as e:
             print(f"❌ Error generating report: {e}")
             return {}
     
-    def preview_report(self) -> Dict[str, Any]:
+    async def preview_report(self) -> Dict[str, Any]:
         """Preview report data before generation"""
         print(f"\n👁 Previewing Report Data")
         
         try:
-            response = self.session.get(
-                f"{self.base_url}/api/report-preview/{self.question_id}",
+            status, body = await self._request(
+                "GET",
+                f"/api/report-preview/{self.question_id}",
                 params={"min_score": 2.0, "limit": 5}
             )
             
-            if response.status_code == 200:
-                data = response.json()
+            if status == 200:
+                data = orjson.loads(body)
                 stats = data['statistics']
                 print(f"✅ Report Preview:")
                 print(f"   📄 Total Papers: {stats['total_papers']}")
@@ -266,54 +286,68 @@ class MetaAnalysisDemo:
                 print(f"   📊 Extracted Papers: {stats['extracted_papers']}")
                 return data
             else:
-                print(f"❌ Failed to preview report: {response.status_code}")
+                print(f"❌ Failed to preview report: {status}")
                 return {}
-                
+        
         except Exception as e:
             print(f"❌ Error previewing report: {e}")
             return {}
     
-    def run_full_demo(self):
+    async def run_full_demo(self):
         """Run the complete demo workflow"""
+        # One pooled keep-alive connection set shared by every step
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=32, keepalive_timeout=30),
+            headers={"Accept-Encoding": "gzip"}
+        )
+        try:
+            await self._run_steps()
+        finally:
+            await self.session.close()
+    
+    async def _run_steps(self):
+        """Run the workflow steps over the open session"""
         print("🚀 Starting Meta-Analysis AI Backend Demo")
         print("=" * 50)
         
         # Step 0: Health check
-        if not self.test_health():
+        if not await self.test_health():
             print("❌ API is not available. Please start the server first.")
             sys.exit(1)
         
         # Step 1: Create research question
-        question_data = self.create_research_question()
+        question_data = await self.create_research_question()
         if not question_data:
             return
         
         # Step 2: Search PubMed
-        papers_data = self.search_pubmed(max_results=15)
+        papers_data = await self.search_pubmed(max_results=15)
         if not papers_data:
             return
         
         # Step 3: Screen papers
-        screening_data = self.screen_papers(papers_data)
+        screening_data = await self.screen_papers(papers_data)
         if not screening_data:
             return
         
         # Step 4: Get filtered papers
-        filtered_papers = self.get_filtered_papers(min_score=2.5)
+        filtered_papers = await self.get_filtered_papers(min_score=2.5)
         if not filtered_papers:
             return
         
         # Step 5: Extract data
-        extraction_data = self.extract_data(filtered_papers)
+        extraction_data = await self.extract_data(filtered_papers)
         if not extraction_data:
             return
         
         # Step 6: Preview report
-        self.preview_report()
+        await self.preview_report()
         
-        # Step 7: Generate reports
-        csv_report = self.generate_report("csv")
-        excel_report = self.generate_report("xlsx")
+        # Step 7: Generate reports (independent of each other, so requested together)
+        csv_report, excel_report = await asyncio.gather(
+            self.generate_report("csv"),
+            self.generate_report("xlsx")
+        )
         
         print("\n🎉 Demo Completed Successfully!")
         print("=" * 50)
@@ -332,7 +366,7 @@ def main():
     demo = MetaAnalysisDemo(base_url="http://localhost:8000")
     
     try:
-        demo.run_full_demo()
+        asyncio.run(demo.run_full_demo())
     except KeyboardInterrupt:
         print("\n\n❌ Demo interrupted by user")
     except Exception as e:
@@ -1,16 +1,18 @@
 from fastapi import FastAPI, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
 from dotenv import load_dotenv
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime
 
 from database import get_db, engine
 from models import Base
 from routers import research_questions, pubmed_search, screening, extraction, reports
-from services.ai_service import AIService
 from utils.logging_config import setup_logging
 from utils.error_handlers import setup_exception_handlers
 
@@ -19,13 +21,24 @@ load_dotenv()
 # Setup logging
 logger = setup_logging()
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Create tables unless the schema is managed elsewhere (set CREATE_TABLES_ON_STARTUP=0)
+if os.getenv("CREATE_TABLES_ON_STARTUP", "1") == "1":
+    Base.metadata.create_all(bind=engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Report jobs run on this process's own pool, so any a previous run left unfinished never will
+    interrupted = reports.fail_interrupted_report_jobs()
+    if interrupted:
+        logger.warning(f"Marked {interrupted} interrupted report jobs as failed")
+    yield
 
 app = FastAPI(
     title="Meta-Analysis AI Backend",
     description="Backend API for automated meta-analysis research",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Setup exception handlers
@@ -40,6 +53,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON bodies (abstracts, MeSH terms, extracted data); small ones aren't worth it
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Include routers
 app.include_router(research_questions.router, prefix="/api", tags=["Research Questions"])
 app.include_router(pubmed_search.router, prefix="/api", tags=["PubMed Search"])
@@ -47,14 +63,15 @@ app.include_router(screening.router, prefix="/api", tags=["Paper Screening"])
 app.include_router(extraction.router, prefix="/api", tags=["Data Extraction"])
 app.include_router(reports.router, prefix="/api", tags=["Reports"])
 
+ROOT_RESPONSE = {"message": "Meta-Analysis AI Backend API", "version": "1.0.0"}
+
+# Probed constantly by load balancers, so these stay on the event loop and skip logging
 @app.get("/")
 async def root():
-    logger.info("Root endpoint accessed")
-    return {"message": "Meta-Analysis AI Backend API", "version": "1.0.0"}
+    return ROOT_RESPONSE
 
 @app.get("/health")
 async def health_check():
-    logger.info("Health check endpoint accessed")
     return {"status": "healthy", "timestamp": str(datetime.utcnow())}
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Float, DateTime, JSON, ForeignKey, Integer
+from sqlalchemy import Column, String, Text, Float, DateTime, JSON, Boolean, ForeignKey, Integer, Index, UniqueConstraint, Uuid, false, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
@@ -10,7 +10,7 @@ Base = declarative_base()
 class ResearchQuestion(Base):
     __tablename__ = "research_questions"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
     user_id = Column(String, nullable=True)  # Optional for now
     original_text = Column(Text, nullable=False)
     rephrased_text = Column(Text, nullable=True)
@@ -23,20 +23,75 @@ class ResearchQuestion(Base):
 class Paper(Base):
     __tablename__ = "papers"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    question_id = Column(String, ForeignKey("research_questions.id"), nullable=False)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    question_id = Column(Uuid, ForeignKey("research_questions.id"), nullable=False)
     pmid = Column(String, nullable=False)
     title = Column(Text, nullable=True)
     abstract = Column(Text, nullable=True)
     authors = Column(Text, nullable=True)
     publication_date = Column(String, nullable=True)
     doi = Column(String, nullable=True)
-    mesh_terms = Column(JSON, nullable=True)  # Store as JSON array
+    mesh_terms = Column(ARRAY(String).with_variant(JSON, "sqlite"), nullable=True)  # Native text[] on Postgres, JSON array on SQLite
     pdf_link = Column(String, nullable=True)
     screening_json = Column(JSON, nullable=True)
     score = Column(Float, nullable=True)
     extracted_data = Column(JSON, nullable=True)
+    # Flags kept alongside the JSON columns so filters never test the JSON itself
+    is_screened = Column(Boolean, nullable=False, default=False, server_default=false())
+    is_extracted = Column(Boolean, nullable=False, default=False, server_default=false())
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationship
-    research_question = relationship("ResearchQuestion", back_populates="papers")
\ No newline at end of file
+    research_question = relationship("ResearchQuestion", back_populates="papers")
+    
+    # Filtered and extracted-data listings select by question and read in score order;
+    # the partial indexes only cover the rows those listings can return. ORDER BY score DESC
+    # walks these backwards, so no separate descending index is needed
+    __table_args__ = (
+        UniqueConstraint("question_id", "pmid", name="uq_papers_qid_pmid"),
+        Index("ix_papers_qid_score", "question_id", "score"),
+        Index("ix_papers_qid_score_screened", "question_id", "score",
+              postgresql_where=text("is_screened"),
+              sqlite_where=text("is_screened = 1")),
+        Index("ix_papers_qid_score_extracted", "question_id", "score",
+              postgresql_where=text("is_extracted"),
+              sqlite_where=text("is_extracted = 1")),
+        Index("ix_papers_pmid", "pmid"),
+    )
+
+class PaperExtractionCache(Base):
+    __tablename__ = "paper_extraction_cache"
+    
+    # sha256 of the title and abstract the extraction was made from
+    content_hash = Column(String, primary_key=True)
+    extracted_data = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class PaperScreeningCache(Base):
+    __tablename__ = "paper_screening_cache"
+    
+    # sha256 of the research question, title and abstract the screening was made from
+    content_hash = Column(String, primary_key=True)
+    screening_result = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ReportJob(Base):
+    __tablename__ = "report_jobs"
+    
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    question_id = Column(Uuid, ForeignKey("research_questions.id"), nullable=False)
+    format = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending, running, completed or failed
+    filename = Column(String, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class PubMedArticleCache(Base):
+    __tablename__ = "pubmed_article_cache"
+    
+    # Parsed efetch record, shared by every question whose search returns the PMID
+    pmid = Column(String, primary_key=True)
+    article = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
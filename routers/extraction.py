@@ -1,47 +1,88 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from database import get_db
-from models import Paper
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from database import get_async_db, dialect_insert
+from models import Paper, PaperExtractionCache
+from pydantic import TypeAdapter
 from schemas import DataExtractionRequest, DataExtractionResponse, ExtractedData, FilteredPaperResponse
 from services.ai_service import AIService
-from typing import List
+from utils.http_cache import paper_etag_async, conditional_response
+from typing import Any, Dict, List, Optional
+from contextlib import aclosing
+import hashlib
+import uuid
 
 router = APIRouter()
 ai_service = AIService()
 
+EXTRACTION_FIELDS = (
+    'study_design',
+    'patient_characteristics',
+    'treatment_characteristics',
+    'intervention',
+    'comparison',
+    'outcomes'
+)
+
+# Built once per process rather than per response
+_extracted_data_list = TypeAdapter(List[ExtractedData])
+
+def _content_hash(title: Optional[str], abstract: Optional[str]) -> str:
+    """Key extractions by the text sent to the model, so identical papers share one"""
+    return hashlib.sha256(f"{title or ''}\x00{abstract or ''}".encode('utf-8')).hexdigest()
+
+async def _save_extractions(db: AsyncSession, write_back: Dict[uuid.UUID, Dict[str, Any]], cache_rows: Dict[str, Dict[str, Any]]):
+    """Cache fresh extractions and store extracted data on the papers by primary key"""
+    if cache_rows:
+        await db.execute(
+            dialect_insert(db)(PaperExtractionCache)
+            .values([
+                {'content_hash': content_hash, 'extracted_data': data}
+                for content_hash, data in cache_rows.items()
+            ])
+            .on_conflict_do_nothing(index_elements=['content_hash'])
+        )
+    
+    if write_back:
+        # One executemany UPDATE for every paper, bypassing the unit-of-work flush
+        await db.execute(
+            update(Paper.__table__)
+            .where(Paper.__table__.c.id == bindparam('b_id'))
+            .values(extracted_data=bindparam('b_data'), is_extracted=True),
+            [{'b_id': paper_id, 'b_data': data} for paper_id, data in write_back.items()]
+        )
+
 @router.get("/filtered-papers", response_model=List[FilteredPaperResponse])
 async def get_filtered_papers(
-    question_id: str = Query(..., description="Research question ID"),
+    request: Request,
+    response: Response,
+    question_id: uuid.UUID = Query(..., description="Research question ID"),
     min_score: float = Query(4.0, description="Minimum score threshold"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Retrieve filtered papers above scoring threshold
     """
     try:
-        # Get papers with scores above threshold
-        papers = db.query(Paper).filter(
-            Paper.question_id == question_id,
-            Paper.score >= min_score,
-            Paper.screening_json.isnot(None)
-        ).order_by(Paper.score.desc()).all()
+        not_modified = conditional_response(request, response, await paper_etag_async(db, question_id, request))
+        if not_modified:
+            return not_modified
         
-        if not papers:
-            return []
-        
-        # Convert to response format
-        filtered_papers = []
-        for paper in papers:
-            filtered_paper = FilteredPaperResponse(
-                pmid=paper.pmid,
-                score=paper.score,
-                title=paper.title,
-                abstract=paper.abstract,
-                pdf_link=paper.pdf_link
-            )
-            filtered_papers.append(filtered_paper)
+        # Get papers with scores above threshold, loading only the columns in the response
+        result = await db.execute(
+            select(Paper).options(
+                load_only(Paper.pmid, Paper.score, Paper.title, Paper.abstract, Paper.pdf_link)
+            ).where(
+                Paper.question_id == question_id,
+                Paper.score >= min_score,
+                Paper.is_screened
+            ).order_by(Paper.score.desc())
+        )
+        papers = result.scalars().all()
         
-        return filtered_papers
+        # The response model reads the fields straight off the loaded rows
+        return papers
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving filtered papers: {str(e)}")
@@ -49,90 +90,130 @@ async def get_filtered_papers(
 @router.post("/extract-data", response_model=DataExtractionResponse)
 async def extract_data_from_papers(
     request: DataExtractionRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Extract structured meta-analysis data from selected papers
     """
     try:
-        # Get papers by PMIDs
-        papers = db.query(Paper).filter(Paper.pmid.in_(request.paper_ids)).all()
+        # Get papers by PMIDs, loading only what the extraction reads
+        result = await db.execute(
+            select(Paper).options(
+                load_only(
+                    Paper.id, Paper.pmid, Paper.title, Paper.abstract,
+                    Paper.authors, Paper.publication_date, Paper.extracted_data
+                )
+            ).where(Paper.pmid.in_(request.paper_ids))
+        )
+        papers = result.scalars().all()
         
         if not papers:
             raise HTTPException(status_code=404, detail="No papers found with provided IDs")
         
-        # Prepare papers data for AI extraction
-        papers_data = []
+        # Index the loaded papers so results are written back by primary key
+        by_pmid = {}
         for paper in papers:
-            paper_data = {
+            by_pmid.setdefault(paper.pmid, paper)
+        
+        # Prepare papers data for AI extraction
+        papers_data = {
+            pmid: {
                 'pmid': paper.pmid,
                 'title': paper.title,
                 'abstract': paper.abstract,
                 'authors': paper.authors,
                 'publication_date': paper.publication_date
             }
-            papers_data.append(paper_data)
-        
-        # Extract data using AI service
-        extracted_results = ai_service.extract_data(papers_data)
-        
-        # Store extracted data in database
-        for result in extracted_results:
-            paper = db.query(Paper).filter(Paper.pmid == result['pmid']).first()
-            if paper:
-                paper.extracted_data = {
-                    'study_design': result.get('study_design'),
-                    'patient_characteristics': result.get('patient_characteristics'),
-                    'treatment_characteristics': result.get('treatment_characteristics'),
-                    'intervention': result.get('intervention'),
-                    'comparison': result.get('comparison'),
-                    'outcomes': result.get('outcomes')
-                }
+            for pmid, paper in by_pmid.items()
+        }
         
-        db.commit()
+        # Reuse extractions already stored on the paper, or made for the same
+        # title and abstract under another question, instead of calling the model
+        results_by_pmid = {}
+        pending = {}
+        write_back = {}
+        for pmid, paper in by_pmid.items():
+            if paper.extracted_data:
+                results_by_pmid[pmid] = {'pmid': pmid, **paper.extracted_data}
+            else:
+                pending[pmid] = _content_hash(paper.title, paper.abstract)
         
-        # Convert to response format
-        extracted_data_list = []
-        for result in extracted_results:
-            extracted_data = ExtractedData(
-                pmid=result['pmid'],
-                study_design=result.get('study_design'),
-                patient_characteristics=result.get('patient_characteristics'),
-                treatment_characteristics=result.get('treatment_characteristics'),
-                intervention=result.get('intervention'),
-                comparison=result.get('comparison'),
-                outcomes=result.get('outcomes')
-            )
-            extracted_data_list.append(extracted_data)
+        if pending:
+            cached_rows = (await db.execute(
+                select(PaperExtractionCache).where(
+                    PaperExtractionCache.content_hash.in_(set(pending.values()))
+                )
+            )).scalars().all()
+            cached = {row.content_hash: row.extracted_data for row in cached_rows}
+            for pmid, content_hash in list(pending.items()):
+                if content_hash in cached:
+                    results_by_pmid[pmid] = {'pmid': pmid, **cached[content_hash]}
+                    write_back[by_pmid[pmid].id] = cached[content_hash]
+                    del pending[pmid]
+        
+        await _save_extractions(db, write_back, {})
+        await db.commit()
         
-        return DataExtractionResponse(extracted_data=extracted_data_list)
+        # Extract the rest using AI service, saving each batch as it finishes so a failure
+        # part-way through keeps the work already done. The batches are closed on the way
+        # out, so an error saving one cancels those still running
+        pending_pmids = list(pending)
+        async with aclosing(ai_service.extract_data_iter([papers_data[pmid] for pmid in pending_pmids])) as batches:
+            async for start, batch_results in batches:
+                write_back = {}
+                cache_rows = {}
+                for pmid, result in zip(pending_pmids[start:], batch_results):
+                    results_by_pmid[pmid] = result
+                    # Demo answers and failure fallbacks are returned but not kept, so the
+                    # paper is extracted again once the model answers
+                    if ai_service.has_provider and not result.get('fallback'):
+                        data = {field: result.get(field) for field in EXTRACTION_FIELDS}
+                        write_back[by_pmid[pmid].id] = data
+                        cache_rows[pending[pmid]] = data
+                await _save_extractions(db, write_back, cache_rows)
+                await db.commit()
+        
+        extracted_results = [results_by_pmid[pmid] for pmid in by_pmid if pmid in results_by_pmid]
+        
+        return DataExtractionResponse.model_construct(
+            extracted_data=_extracted_data_list.validate_python(extracted_results)
+        )
         
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error extracting data: {str(e)}")
 
 @router.get("/extracted-data/{question_id}")
 async def get_extracted_data(
-    question_id: str,
+    question_id: uuid.UUID,
+    request: Request,
+    response: Response,
     min_score: float = Query(0.0, description="Minimum score filter"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get all extracted data for a research question
     """
     try:
-        # Get papers with extracted data
-        query = db.query(Paper).filter(
+        not_modified = conditional_response(request, response, await paper_etag_async(db, question_id, request))
+        if not_modified:
+            return not_modified
+        
+        # Get papers with extracted data, leaving the other large columns unloaded
+        query = select(Paper).options(
+            load_only(Paper.pmid, Paper.title, Paper.score, Paper.extracted_data)
+        ).where(
             Paper.question_id == question_id,
-            Paper.extracted_data.isnot(None)
+            Paper.is_extracted
         )
         
         if min_score > 0:
-            query = query.filter(Paper.score >= min_score)
+            query = query.where(Paper.score >= min_score)
         
-        papers = query.order_by(Paper.score.desc()).all()
+        result = await db.execute(query.order_by(Paper.score.desc()))
+        papers = result.scalars().all()
         
         if not papers:
             return {"message": "No extracted data found", "data": []}
@@ -167,22 +248,30 @@ async def get_extracted_data(
         raise HTTPException(status_code=500, detail=f"Error retrieving extracted data: {str(e)}")
 
 @router.delete("/extracted-data/{pmid}")
-async def delete_extracted_data(pmid: str, db: Session = Depends(get_db)):
+async def delete_extracted_data(pmid: str, db: AsyncSession = Depends(get_async_db)):
     """
     Delete extracted data for a specific paper
     """
     try:
-        paper = db.query(Paper).filter(Paper.pmid == pmid).first()
+        result = await db.execute(select(Paper).where(Paper.pmid == pmid).limit(1))
+        paper = result.scalars().first()
         if not paper:
             raise HTTPException(status_code=404, detail="Paper not found")
         
         paper.extracted_data = None
-        db.commit()
+        paper.is_extracted = False
+        # Forget the shared extraction too, so the paper is re-extracted next time
+        await db.execute(
+            delete(PaperExtractionCache).where(
+                PaperExtractionCache.content_hash == _content_hash(paper.title, paper.abstract)
+            )
+        )
+        await db.commit()
         
         return {"message": f"Extracted data deleted for paper {pmid}"}
         
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error deleting extracted data: {str(e)}")
\ No newline at end of file
@@ -1,83 +1,119 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from database import get_db
-from models import ResearchQuestion, Paper
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from database import get_async_db, dialect_insert
+from models import Paper, PubMedArticleCache
+from pydantic import TypeAdapter
 from schemas import PubMedSearchResponse, PaperResponse
 from services.pubmed_service import PubMedService
-from typing import Optional
+from utils.http_cache import paper_etag_async, conditional_response
+from utils.question_cache import get_question
+from typing import List, Optional
+from datetime import datetime, timedelta
+import os
+import uuid
 
 router = APIRouter()
 pubmed_service = PubMedService()
 
+# Parsed articles are reused for this many days before efetch is asked for them again
+PUBMED_CACHE_DAYS = int(os.getenv("PUBMED_CACHE_DAYS", "30"))
+
+# Built once per process rather than per response
+_paper_list = TypeAdapter(List[PaperResponse])
+
 @router.get("/pubmed-search", response_model=PubMedSearchResponse)
 async def search_pubmed(
-    question_id: str = Query(..., description="Research question ID"),
+    question_id: uuid.UUID = Query(..., description="Research question ID"),
     max_results: int = Query(100, description="Maximum number of results to return"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Convert rephrased question into MeSH terms and retrieve PubMed search results
     """
     try:
         # Get research question from database
-        research_question = db.query(ResearchQuestion).filter(ResearchQuestion.id == question_id).first()
+        research_question = await get_question(db, question_id)
         if not research_question:
             raise HTTPException(status_code=404, detail="Research question not found")
         
         # Use rephrased question for search
         search_query = research_question.rephrased_text or research_question.original_text
         
-        # Search PubMed
-        query_translation, pmids, total_count = pubmed_service.search_papers(search_query, max_results)
+        # Search PubMed and fetch paper details on a worker thread, so other requests
+        # are served while the E-utilities round trips are in flight
+        query_translation, pmids, total_count = await run_in_threadpool(pubmed_service.search_papers, search_query, max_results)
+        
+        # Reuse articles fetched recently, under any question, and only fetch the rest
+        now = datetime.utcnow()
+        cached = dict((await db.execute(
+            select(PubMedArticleCache.pmid, PubMedArticleCache.article).where(
+                PubMedArticleCache.pmid.in_(pmids),
+                PubMedArticleCache.created_at >= now - timedelta(days=PUBMED_CACHE_DAYS)
+            )
+        )).all()) if pmids else {}
+        missing = [pmid for pmid in pmids if pmid not in cached]
+        fetched = await run_in_threadpool(pubmed_service.fetch_paper_details, missing) if missing else []
+        
+        missing_set = set(missing)
+        cache_rows = {
+            paper_data['pmid']: {'pmid': paper_data['pmid'], 'article': paper_data, 'created_at': now}
+            for paper_data in fetched if paper_data['pmid'] in missing_set
+        }
+        if cache_rows:
+            insert = dialect_insert(db)
+            row_list = list(cache_rows.values())
+            for i in range(0, len(row_list), 500):
+                statement = insert(PubMedArticleCache).values(row_list[i:i + 500])
+                await db.execute(statement.on_conflict_do_update(
+                    index_elements=['pmid'],
+                    set_={'article': statement.excluded.article, 'created_at': statement.excluded.created_at}
+                ))
         
-        # Fetch paper details
-        papers_data = pubmed_service.fetch_paper_details(pmids)
+        articles = {**cached, **{pmid: row['article'] for pmid, row in cache_rows.items()}}
+        papers_data = [articles[pmid] for pmid in pmids if pmid in articles]
         
-        # Store papers in database
-        stored_papers = []
+        # Store papers in database, leaving papers already saved for this question untouched
+        rows = {}
         for paper_data in papers_data:
-            # Check if paper already exists for this question
-            existing_paper = db.query(Paper).filter(
-                Paper.question_id == question_id,
-                Paper.pmid == paper_data['pmid']
-            ).first()
-            
-            if not existing_paper:
-                paper = Paper(
-                    question_id=question_id,
-                    pmid=paper_data['pmid'],
-                    title=paper_data.get('title'),
-                    abstract=paper_data.get('abstract'),
-                    authors=paper_data.get('authors'),
-                    publication_date=paper_data.get('publication_date'),
-                    doi=paper_data.get('doi'),
-                    mesh_terms=paper_data.get('mesh_terms', []),
-                    pdf_link=paper_data.get('pdf_link')
-                )
-                db.add(paper)
-                stored_papers.append(paper)
-            else:
-                stored_papers.append(existing_paper)
+            rows.setdefault(paper_data['pmid'], {
+                'id': uuid.uuid4(),
+                'question_id': question_id,
+                'pmid': paper_data['pmid'],
+                'title': paper_data.get('title'),
+                'abstract': paper_data.get('abstract'),
+                'authors': paper_data.get('authors'),
+                'publication_date': paper_data.get('publication_date'),
+                'doi': paper_data.get('doi'),
+                'mesh_terms': paper_data.get('mesh_terms', []),
+                'pdf_link': paper_data.get('pdf_link')
+            })
         
-        db.commit()
+        if rows:
+            insert = dialect_insert(db)
+            row_list = list(rows.values())
+            for i in range(0, len(row_list), 500):
+                await db.execute(
+                    insert(Paper)
+                    .values(row_list[i:i + 500])
+                    .on_conflict_do_nothing(index_elements=['question_id', 'pmid'])
+                )
+        await db.commit()
         
-        # Convert to response format
-        paper_responses = []
-        for paper in stored_papers:
-            paper_response = PaperResponse(
-                pmid=paper.pmid,
-                title=paper.title,
-                abstract=paper.abstract,
-                authors=paper.authors,
-                publication_date=paper.publication_date,
-                doi=paper.doi,
-                mesh_terms=paper.mesh_terms if isinstance(paper.mesh_terms, list) else [],
-                pdf_link=paper.pdf_link
+        # Read the stored papers back in search order
+        stored = (await db.execute(
+            select(Paper).where(
+                Paper.question_id == question_id,
+                Paper.pmid.in_(list(rows))
             )
-            paper_responses.append(paper_response)
+        )).scalars().all() if rows else []
+        by_pmid = {paper.pmid: paper for paper in stored}
+        stored_papers = [by_pmid[pmid] for pmid in rows if pmid in by_pmid]
         
         return PubMedSearchResponse(
-            papers=paper_responses,
+            papers=stored_papers,
             total_count=total_count,
             query_translation=query_translation
         )
@@ -85,48 +121,55 @@ async def search_pubmed(
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error searching PubMed: {str(e)}")
 
 @router.get("/pubmed-search/{question_id}/papers")
 async def get_papers_for_question(
-    question_id: str,
+    question_id: uuid.UUID,
+    request: Request,
+    response: Response,
     skip: int = Query(0, description="Number of papers to skip"),
     limit: int = Query(50, description="Number of papers to return"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get paginated papers for a specific research question
     """
     try:
         # Verify research question exists
-        research_question = db.query(ResearchQuestion).filter(ResearchQuestion.id == question_id).first()
+        research_question = await get_question(db, question_id)
         if not research_question:
             raise HTTPException(status_code=404, detail="Research question not found")
         
-        # Get papers with pagination
-        papers = db.query(Paper).filter(Paper.question_id == question_id).offset(skip).limit(limit).all()
+        not_modified = conditional_response(request, response, await paper_etag_async(db, question_id, request))
+        if not_modified:
+            return not_modified
         
-        # Get total count
-        total_count = db.query(Paper).filter(Paper.question_id == question_id).count()
+        # Get papers with pagination, skipping the screening and extraction JSON; the
+        # window count returns the total with every row instead of a second query
+        rows = (await db.execute(
+            select(Paper, func.count().over().label("total")).options(
+                load_only(
+                    Paper.pmid, Paper.title, Paper.abstract, Paper.authors,
+                    Paper.publication_date, Paper.doi, Paper.mesh_terms, Paper.pdf_link
+                )
+            ).where(Paper.question_id == question_id).offset(skip).limit(limit)
+        )).all()
         
-        # Convert to response format
-        paper_responses = []
-        for paper in papers:
-            paper_response = PaperResponse(
-                pmid=paper.pmid,
-                title=paper.title,
-                abstract=paper.abstract,
-                authors=paper.authors,
-                publication_date=paper.publication_date,
-                doi=paper.doi,
-                mesh_terms=paper.mesh_terms if isinstance(paper.mesh_terms, list) else [],
-                pdf_link=paper.pdf_link
+        papers = [row[0] for row in rows]
+        if rows:
+            total_count = rows[0][1]
+        elif skip > 0:
+            # A page past the end has no rows to carry the total
+            total_count = await db.scalar(
+                select(func.count(Paper.id)).where(Paper.question_id == question_id)
             )
-            paper_responses.append(paper_response)
+        else:
+            total_count = 0
         
         return {
-            "papers": paper_responses,
+            "papers": _paper_list.validate_python(papers, from_attributes=True),
             "total_count": total_count,
             "skip": skip,
             "limit": limit
@@ -1,49 +1,151 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from database import get_db
-from models import ResearchQuestion, Paper
-from schemas import ReportResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db, AsyncSessionLocal, SessionLocal
+from models import Paper, ReportJob
+from schemas import ReportResponse, ReportJobResponse
 from services.report_service import ReportService
+from utils.http_cache import conditional_response, version_etag
+from utils.question_cache import get_question
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import io
+import logging
 import os
+import uuid
 
 router = APIRouter()
 report_service = ReportService()
+logger = logging.getLogger("meta_analysis_api")
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Background report jobs build at most this many reports at once, so a burst of large
+# requests queues up instead of holding every report in memory together. They run on
+# threads of their own; waiting jobs never hold the threadpool shared with sync routes
+REPORT_JOB_CONCURRENCY = int(os.getenv("REPORT_JOB_CONCURRENCY", "2"))
+_report_jobs = ThreadPoolExecutor(max_workers=REPORT_JOB_CONCURRENCY, thread_name_prefix="report-job")
+
+def _paper_data(paper: Paper) -> dict:
+    """Report fields for one paper"""
+    return {
+        'pmid': paper.pmid,
+        'title': paper.title,
+        'authors': paper.authors,
+        'publication_date': paper.publication_date,
+        'doi': paper.doi,
+        'abstract': paper.abstract,
+        'pdf_link': paper.pdf_link,
+        'mesh_terms': paper.mesh_terms,
+        'score': paper.score,
+        'screening_json': paper.screening_json,
+        'extracted_data': paper.extracted_data
+    }
+
+def _write_report(generate, question_data: dict, query) -> str:
+    """Build a report file on a worker thread, reading papers through a server-side cursor"""
+    with SessionLocal() as db:
+        papers = db.execute(query.execution_options(yield_per=500)).scalars()
+        papers_data = (_paper_data(paper) for paper in papers)
+        if generate != report_service.generate_csv_report:
+            # The other formats build their output from every paper at once
+            papers_data = list(papers_data)
+        return generate(question_data, papers_data)
+
+def _run_report_job(job_id: uuid.UUID, generate, question_data: dict, query) -> None:
+    """Build a queued report on the report job pool, recording the outcome on its job"""
+    with SessionLocal() as db:
+        try:
+            job = db.get(ReportJob, job_id)
+            job.status = "running"
+            db.commit()
+            
+            job.filename = _write_report(generate, question_data, query)
+            job.status = "completed"
+            db.commit()
+        except Exception as e:
+            # Whatever step failed, the job must not be left pending or running
+            db.rollback()
+            try:
+                db.execute(update(ReportJob).where(ReportJob.id == job_id).values(status="failed", error=str(e)))
+                db.commit()
+            except Exception:
+                logger.exception("Could not record failure of report job %s", job_id)
+
+def fail_interrupted_report_jobs() -> int:
+    """Mark jobs a previous process left pending or running as failed; the pool that would have built them is gone"""
+    with SessionLocal() as db:
+        result = db.execute(
+            update(ReportJob)
+            .where(ReportJob.status.in_(("pending", "running")))
+            .values(status="failed", error="Interrupted by a server restart; generate the report again")
+        )
+        db.commit()
+        return result.rowcount
+
+def _job_response(job: ReportJob) -> ReportJobResponse:
+    """Status of a report job, with the download URL once it has completed"""
+    return ReportJobResponse(
+        job_id=job.id,
+        status=job.status,
+        status_url=f"/api/report-jobs/{job.id}",
+        report_url=f"/api/download-report/{job.filename}" if job.filename else None,
+        error=job.error
+    )
+
+def _excel_report_bytes(question_data: dict, query) -> bytes:
+    """Build the Excel report in memory on a worker thread"""
+    with SessionLocal() as db:
+        papers = db.execute(query.execution_options(yield_per=500)).scalars()
+        papers_data = [_paper_data(paper) for paper in papers]
+    buffer = io.BytesIO()
+    report_service.write_excel_report(buffer, question_data, papers_data)
+    return buffer.getvalue()
+
+def _report_query(question_id: uuid.UUID, min_score: float, include_all: bool):
+    """Papers selected for a report, best scored first"""
+    query = select(Paper).where(Paper.question_id == question_id)
+    
+    if min_score > 0:
+        query = query.where(Paper.score >= min_score)
+    
+    if not include_all:
+        # Only include papers with either screening or extraction data
+        query = query.where(
+            Paper.is_screened | Paper.is_extracted
+        )
+    
+    return query.order_by(Paper.score.desc())
 
 @router.get("/generate-report", response_model=ReportResponse)
 async def generate_report(
-    question_id: str = Query(..., description="Research question ID"),
-    format: str = Query("csv", description="Report format: csv, xlsx, docx, or pdf"),
+    question_id: uuid.UUID = Query(..., description="Research question ID"),
+    format: str = Query("csv", description="Report format: csv, parquet, xlsx, docx, or pdf"),
     min_score: float = Query(0.0, description="Minimum score filter for papers"),
     include_all: bool = Query(False, description="Include all papers regardless of extraction status"),
-    db: Session = Depends(get_db)
+    stream: bool = Query(False, description="Return a CSV or XLSX report in the response instead of a download URL; a streamed XLSX omits the full paper records and abstracts"),
+    background: bool = Query(False, description="Queue the report and return 202 with a job to poll instead of waiting for it"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Generate a downloadable report in CSV, XLSX, DOCX, or PDF format
+    Generate a downloadable report in CSV, Parquet, XLSX, DOCX, or PDF format
+    
+    With stream=true, CSV and XLSX reports are sent back directly without writing a report file.
+    A streamed XLSX report leaves out the full paper records, abstracts included, that a saved
+    one writes to its matching meta_analysis_full_*.parquet file.
+    With background=true, the report is queued for the report job pool and its job polled at status_url.
     """
     try:
         # Get research question
-        research_question = db.query(ResearchQuestion).filter(
-            ResearchQuestion.id == question_id
-        ).first()
+        research_question = await get_question(db, question_id)
         if not research_question:
             raise HTTPException(status_code=404, detail="Research question not found")
         
-        # Get papers based on filters
-        query = db.query(Paper).filter(Paper.question_id == question_id)
-        
-        if min_score > 0:
-            query = query.filter(Paper.score >= min_score)
-        
-        if not include_all:
-            # Only include papers with either screening or extraction data
-            query = query.filter(
-                (Paper.screening_json.isnot(None)) | (Paper.extracted_data.isnot(None))
-            )
-        
-        papers = query.order_by(Paper.score.desc()).all()
-        
-        if not papers:
+        # Check papers match the filters; they are read in batches while the report is written
+        query = _report_query(question_id, min_score, include_all)
+        if await db.scalar(query.with_only_columns(Paper.id).limit(1)) is None:
             raise HTTPException(status_code=404, detail="No papers found matching criteria")
         
         # Prepare question data
@@ -54,34 +156,39 @@ async def generate_report(
             'pico_json': research_question.pico_json or {}
         }
         
-        # Prepare papers data
-        papers_data = []
-        for paper in papers:
-            paper_data = {
-                'pmid': paper.pmid,
-                'title': paper.title,
-                'authors': paper.authors,
-                'publication_date': paper.publication_date,
-                'doi': paper.doi,
-                'abstract': paper.abstract,
-                'pdf_link': paper.pdf_link,
-                'mesh_terms': paper.mesh_terms,
-                'score': paper.score,
-                'screening_json': paper.screening_json,
-                'extracted_data': paper.extracted_data
-            }
-            papers_data.append(paper_data)
-        
-        # Generate report based on format
         format_lower = format.lower()
+        if stream:
+            if format_lower in ('parquet', 'docx', 'pdf'):
+                raise HTTPException(status_code=400, detail="Only CSV and XLSX reports can be streamed")
+            if format_lower == 'xlsx':
+                content = await run_in_threadpool(_excel_report_bytes, question_data, query)
+                return Response(
+                    content,
+                    media_type=XLSX_MEDIA_TYPE,
+                    headers={"Content-Disposition": f'attachment; filename="meta_analysis_report_{question_id}.xlsx"'}
+                )
+            return _csv_report_response(question_id, min_score, include_all)
+        
+        # Generate report based on format, on a worker thread so the event loop stays free
         if format_lower == 'xlsx':
-            filename = report_service.generate_excel_report(question_data, papers_data)
+            generate = report_service.generate_excel_report
+        elif format_lower == 'parquet':
+            generate = report_service.generate_parquet_report
         elif format_lower == 'docx':
-            filename = report_service.generate_word_report(question_data, papers_data)
+            generate = report_service.generate_word_report
         elif format_lower == 'pdf':
-            filename = report_service.generate_pdf_report(question_data, papers_data)
+            generate = report_service.generate_pdf_report
         else:  # Default to CSV
-            filename = report_service.generate_csv_report(question_data, papers_data)
+            generate = report_service.generate_csv_report
+        
+        if background:
+            job = ReportJob(question_id=question_id, format=format_lower)
+            db.add(job)
+            await db.commit()
+            _report_jobs.submit(_run_report_job, job.id, generate, question_data, query)
+            return ORJSONResponse(_job_response(job).model_dump(mode="json"), status_code=202)
+        
+        filename = await run_in_threadpool(_write_report, generate, question_data, query)
         
         # Return URL (in a real deployment, this would be a proper URL)
         report_url = f"/api/download-report/{filename}"
@@ -93,6 +200,63 @@ async def generate_report(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating report: {str(e)}")
 
+async def _csv_report_rows(question_id: uuid.UUID, min_score: float, include_all: bool):
+    """Yield the CSV report a row at a time as papers stream in from the database"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(report_service.CSV_COLUMNS)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    
+    # A session of its own, since the response body is sent after the endpoint returns
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            _report_query(question_id, min_score, include_all).execution_options(yield_per=500)
+        )
+        # One chunk per fetched batch of papers rather than per row
+        async for papers in result.scalars().partitions():
+            writer.writerows(report_service.csv_row(_paper_data(paper)) for paper in papers)
+            
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+def _csv_report_response(question_id: uuid.UUID, min_score: float, include_all: bool) -> StreamingResponse:
+    """CSV report streamed as an attachment"""
+    return StreamingResponse(
+        _csv_report_rows(question_id, min_score, include_all),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="meta_analysis_report_{question_id}.csv"'}
+    )
+
+@router.get("/stream-report")
+async def stream_report(
+    question_id: uuid.UUID = Query(..., description="Research question ID"),
+    min_score: float = Query(0.0, description="Minimum score filter for papers"),
+    include_all: bool = Query(False, description="Include all papers regardless of extraction status"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Stream the CSV report directly, without writing a report file first
+    """
+    research_question = await get_question(db, question_id)
+    if not research_question:
+        raise HTTPException(status_code=404, detail="Research question not found")
+    
+    return _csv_report_response(question_id, min_score, include_all)
+
+@router.get("/report-jobs/{job_id}", response_model=ReportJobResponse)
+async def get_report_job(job_id: uuid.UUID, db: AsyncSession = Depends(get_async_db)):
+    """
+    Get the status of a background report job
+    """
+    job = await db.get(ReportJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    
+    return _job_response(job)
+
 @router.get("/download-report/{filename}")
 async def download_report(filename: str):
     """
@@ -101,12 +265,17 @@ async def download_report(filename: str):
     try:
         filepath = report_service.get_report_path(filename)
         
-        if not os.path.exists(filepath):
+        # One stat off the event loop both checks the file exists and feeds FileResponse
+        try:
+            stat_result = await run_in_threadpool(os.stat, filepath)
+        except FileNotFoundError:
             raise HTTPException(status_code=404, detail="Report file not found")
         
         # Determine media type based on file extension
         if filename.endswith('.csv'):
             media_type = "text/csv"
+        elif filename.endswith('.parquet'):
+            media_type = "application/vnd.apache.parquet"
         elif filename.endswith('.xlsx'):
             media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         elif filename.endswith('.docx'):
@@ -119,7 +288,8 @@ async def download_report(filename: str):
         return FileResponse(
             path=filepath,
             filename=filename,
-            media_type=media_type
+            media_type=media_type,
+            stat_result=stat_result
         )
         
     except HTTPException:
@@ -133,7 +303,7 @@ async def list_reports():
     List all generated reports
     """
     try:
-        reports = report_service.list_reports()
+        reports = await run_in_threadpool(report_service.list_reports)
         return {"reports": reports}
         
     except Exception as e:
@@ -145,7 +315,7 @@ async def delete_report(filename: str):
     Delete a report file
     """
     try:
-        success = report_service.delete_report(filename)
+        success = await run_in_threadpool(report_service.delete_report, filename)
         if success:
             return {"message": f"Report {filename} deleted successfully"}
         else:
@@ -158,40 +328,55 @@ async def delete_report(filename: str):
 
 @router.get("/report-preview/{question_id}")
 async def preview_report_data(
-    question_id: str,
+    question_id: uuid.UUID,
+    request: Request,
+    response: Response,
     min_score: float = Query(0.0, description="Minimum score filter"),
     limit: int = Query(10, description="Number of papers to preview"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Preview report data before generating the actual report
     """
     try:
         # Get research question
-        research_question = db.query(ResearchQuestion).filter(
-            ResearchQuestion.id == question_id
-        ).first()
+        research_question = await get_question(db, question_id)
         if not research_question:
             raise HTTPException(status_code=404, detail="Research question not found")
         
-        # Get papers for preview
-        query = db.query(Paper).filter(Paper.question_id == question_id)
+        # Count totals in one pass over the question's papers; the same read versions the
+        # ETag, so a cached preview always matches the counts it was served with
+        result = await db.execute(
+            select(
+                func.count(),
+                func.count().filter(Paper.is_screened),
+                func.count().filter(Paper.is_extracted),
+                func.count().filter(Paper.score >= min_score),
+                func.max(Paper.updated_at)
+            ).select_from(Paper).where(Paper.question_id == question_id)
+        )
+        total_papers, screened_papers, extracted_papers, papers_above_threshold, last_updated = result.one()
         
-        if min_score > 0:
-            query = query.filter(Paper.score >= min_score)
+        etag = version_etag(question_id, last_updated, total_papers, request)
+        not_modified = conditional_response(request, response, etag)
+        if not_modified:
+            return not_modified
         
-        papers = query.order_by(Paper.score.desc()).limit(limit).all()
+        # Get papers for preview, reading only the columns the preview shows
+        query = select(
+            Paper.pmid,
+            Paper.title,
+            Paper.score,
+            Paper.publication_date,
+            Paper.is_screened,
+            Paper.is_extracted
+        ).where(Paper.question_id == question_id)
+        
+        if min_score > 0:
+            query = query.where(Paper.score >= min_score)
         
-        # Count totals
-        total_papers = db.query(Paper).filter(Paper.question_id == question_id).count()
-        screened_papers = db.query(Paper).filter(
-            Paper.question_id == question_id,
-            Paper.screening_json.isnot(None)
-        ).count()
-        extracted_papers = db.query(Paper).filter(
-            Paper.question_id == question_id,
-            Paper.extracted_data.isnot(None)
-        ).count()
+        result = await db.execute(query.order_by(Paper.score.desc()).limit(limit))
+        papers = result.all()
         
         # Format preview data
         preview_data = []
@@ -200,8 +385,8 @@ async def preview_report_data(
                 'pmid': paper.pmid,
                 'title': paper.title[:100] + '...' if paper.title and len(paper.title) > 100 else paper.title,
                 'score': paper.score,
-                'has_screening': paper.screening_json is not None,
-                'has_extraction': paper.extracted_data is not None,
+                'has_screening': paper.is_screened,
+                'has_extraction': paper.is_extracted,
                 'publication_date': paper.publication_date
             }
             preview_data.append(data)
@@ -216,7 +401,7 @@ async def preview_report_data(
                 'total_papers': total_papers,
                 'screened_papers': screened_papers,
                 'extracted_papers': extracted_papers,
-                'papers_above_threshold': len([p for p in papers if p.score >= min_score])
+                'papers_above_threshold': papers_above_threshold
             },
             'preview_data': preview_data,
             'filters': {
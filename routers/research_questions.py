@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from models import ResearchQuestion
 from schemas import ResearchQuestionRequest, ResearchQuestionResponse
 from services.ai_service import AIService
+from utils.question_cache import get_question
 import uuid
 
 router = APIRouter()
@@ -13,14 +14,14 @@ ai_service = AIService()
 async def create_research_question(
     request: ResearchQuestionRequest,
     use_ai_rephrasing: bool = False,  # Default to False to avoid restrictive terms
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Capture user research question and PICO criteria, then rephrase using AI
     """
     try:
         # Use AI service to rephrase the question only if requested
-        pico_dict = request.pico.dict() if request.pico else None
+        pico_dict = request.pico.model_dump() if request.pico else None
         
         if use_ai_rephrasing:
             ai_result = ai_service.rephrase_research_question(request.question, pico_dict)
@@ -33,7 +34,7 @@ async def create_research_question(
             }
         
         # Create new research question record
-        question_id = str(uuid.uuid4())
+        question_id = uuid.uuid4()
         research_question = ResearchQuestion(
             id=question_id,
             original_text=request.question,
@@ -42,8 +43,8 @@ async def create_research_question(
         )
         
         db.add(research_question)
-        db.commit()
-        db.refresh(research_question)
+        await db.commit()
+        await db.refresh(research_question)
         
         return ResearchQuestionResponse(
             question_id=question_id,
@@ -53,15 +54,15 @@ async def create_research_question(
         )
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error processing research question: {str(e)}")
 
 @router.get("/research-question/{question_id}")
-async def get_research_question(question_id: str, db: Session = Depends(get_db)):
+async def get_research_question(question_id: uuid.UUID, db: AsyncSession = Depends(get_async_db)):
     """
     Get research question by ID
     """
-    question = db.query(ResearchQuestion).filter(ResearchQuestion.id == question_id).first()
+    question = await get_question(db, question_id)
     if not question:
         raise HTTPException(status_code=404, detail="Research question not found")
     
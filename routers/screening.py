@@ -1,116 +1,174 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
-from models import ResearchQuestion, Paper
-from schemas import ScreeningRequest, ScreeningResponse, ScreenedPaper
-from services.ai_service import AIService
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from database import get_async_db, dialect_insert
+from models import Paper, PaperScreeningCache
+from schemas import ScreeningRequest, ScreeningResponse
+from services.ai_service import AIService, OPENAI_MODEL
+from utils.question_cache import get_question
 from typing import List, Dict, Any
+from contextlib import aclosing
+import asyncio
+import hashlib
 import json
+import uuid
 
 router = APIRouter()
 ai_service = AIService()
 
+def _screening_hash(research_question: str, paper: Dict[str, Any]) -> str:
+    """Key screenings by the question and paper text sent to the model"""
+    key = f"{research_question}\x00{paper.get('title') or ''}\x00{paper.get('abstract') or ''}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+async def _save_screenings(
+    db: AsyncSession,
+    question_id: uuid.UUID,
+    cache_rows: Dict[str, Dict[str, Any]],
+    screened_results: List[Dict[str, Any]]
+):
+    """Cache fresh screenings and store results and scores on the question's papers"""
+    if cache_rows:
+        await db.execute(
+            dialect_insert(db)(PaperScreeningCache)
+            .values([
+                {'content_hash': content_hash, 'screening_result': result}
+                for content_hash, result in cache_rows.items()
+            ])
+            .on_conflict_do_nothing(index_elements=['content_hash'])
+        )
+    
+    # One executemany UPDATE keyed on (question_id, pmid); results for papers not
+    # stored under the question match no row
+    if screened_results:
+        papers = Paper.__table__.c
+        await db.execute(
+            update(Paper.__table__)
+            .where(papers.question_id == bindparam('b_question_id'), papers.pmid == bindparam('b_pmid'))
+            .values(screening_json=bindparam('b_screening'), score=bindparam('b_score'), is_screened=True),
+            [
+                {
+                    'b_question_id': question_id,
+                    'b_pmid': screening_result['pmid'],
+                    # Only the answers present are stored; readers default missing keys
+                    'b_screening': {
+                        key: screening_result[key]
+                        for key in ai_service.SCREENING_FIELDS.values()
+                        if screening_result.get(key) is not None
+                    },
+                    'b_score': screening_result.get('score', 0.0)
+                }
+                for screening_result in screened_results
+            ]
+        )
+
 @router.post("/screening-columns", response_model=ScreeningResponse)
 async def screen_papers(
     request: ScreeningRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Generate AI-screening columns for each paper
     """
     try:
         # Get research question from database
-        research_question = db.query(ResearchQuestion).filter(
-            ResearchQuestion.id == request.question_id
-        ).first()
+        research_question = await get_question(db, request.question_id)
         if not research_question:
             raise HTTPException(status_code=404, detail="Research question not found")
         
         # Use the rephrased question for screening context
         screening_context = research_question.rephrased_text or research_question.original_text
         
-        # Screen papers using AI service
-        screened_results = ai_service.screen_papers(request.papers, screening_context)
-        
-        # Update papers in database with screening results
-        for screening_result in screened_results:
-            paper = db.query(Paper).filter(
-                Paper.question_id == request.question_id,
-                Paper.pmid == screening_result['pmid']
-            ).first()
-            
-            if paper:
-                # Store screening results and score
-                paper.screening_json = {
-                    "study_design": screening_result.get('study_design'),
-                    "intervention": screening_result.get('intervention'),
-                    "population": screening_result.get('population'),
-                    "outcomes": screening_result.get('outcomes'),
-                    "treatment_characteristics": screening_result.get('treatment_characteristics')
-                }
-                paper.score = screening_result.get('score', 0.0)
-        
-        db.commit()
-        
-        # Convert to response format
-        screened_papers = []
-        for result in screened_results:
-            screened_paper = ScreenedPaper(
-                pmid=result['pmid'],
-                study_design=result.get('study_design', 'Maybe'),
-                intervention=result.get('intervention', 'Maybe'),
-                population=result.get('population', 'Maybe'),
-                outcomes=result.get('outcomes', 'Maybe'),
-                treatment_characteristics=result.get('treatment_characteristics', 'Maybe'),
-                score=result.get('score', 0.0)
-            )
-            screened_papers.append(screened_paper)
-        
-        return ScreeningResponse(screened_papers=screened_papers)
+        # Reuse screenings already made for the same question and paper text instead of calling the model
+        content_hashes = [_screening_hash(screening_context, paper) for paper in request.papers]
+        cached = {}
+        if content_hashes:
+            cached_rows = (await db.execute(
+                select(PaperScreeningCache).where(PaperScreeningCache.content_hash.in_(set(content_hashes)))
+            )).scalars().all()
+            cached = {row.content_hash: row.screening_result for row in cached_rows}
+        
+        # A pmid sent more than once is stored once, with the result of its last occurrence
+        last_index = {paper.get('pmid', ''): index for index, paper in enumerate(request.papers)}
+        
+        screened_results = [None] * len(request.papers)
+        stored_results = []
+        pending = []
+        for index, (paper, content_hash) in enumerate(zip(request.papers, content_hashes)):
+            if content_hash not in cached:
+                pending.append(index)
+                continue
+            screened_results[index] = {**cached[content_hash], 'pmid': paper.get('pmid', '')}
+            if last_index[screened_results[index]['pmid']] == index:
+                stored_results.append(screened_results[index])
+        
+        await _save_screenings(db, request.question_id, {}, stored_results)
+        await db.commit()
+        
+        # Screen the rest using AI service, saving each batch as it finishes so a failure
+        # part-way through keeps the work already done. The batches are closed on the way
+        # out, so an error saving one cancels those still running
+        async with aclosing(ai_service.screen_papers_iter(
+            [request.papers[index] for index in pending], screening_context
+        )) as batches:
+            async for start, batch_results in batches:
+                cache_rows = {}
+                stored_results = []
+                for index, screening_result in zip(pending[start:], batch_results):
+                    screened_results[index] = screening_result
+                    # Demo answers and failure fallbacks are not worth keeping
+                    if ai_service.has_provider and not screening_result.get('fallback'):
+                        cache_rows[content_hashes[index]] = {key: value for key, value in screening_result.items() if key != 'pmid'}
+                    if last_index[screening_result['pmid']] == index:
+                        stored_results.append(screening_result)
+                await _save_screenings(db, request.question_id, cache_rows, stored_results)
+                await db.commit()
+        
+        # The results are already dicts; the response model validates and filters them once
+        return {"screened_papers": screened_results}
         
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error screening papers: {str(e)}")
 
 @router.post("/custom-screening-column")
 async def create_custom_screening_column(
-    question_id: str,
+    question_id: uuid.UUID,
     column_name: str,
     column_criteria: str,
     paper_ids: List[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Generate custom AI-based screening column based on user-defined criteria
     """
     try:
         # Get research question
-        research_question = db.query(ResearchQuestion).filter(
-            ResearchQuestion.id == question_id
-        ).first()
+        research_question = await get_question(db, question_id)
         if not research_question:
             raise HTTPException(status_code=404, detail="Research question not found")
         
         # Get papers to screen
+        query = select(Paper).where(Paper.question_id == question_id)
         if paper_ids:
-            papers = db.query(Paper).filter(
-                Paper.question_id == question_id,
-                Paper.pmid.in_(paper_ids)
-            ).all()
-        else:
-            papers = db.query(Paper).filter(Paper.question_id == question_id).all()
+            query = query.where(Paper.pmid.in_(paper_ids))
+        papers = (await db.execute(query)).scalars().all()
         
         if not papers:
             raise HTTPException(status_code=404, detail="No papers found")
         
-        # Screen papers with custom criteria
-        custom_results = []
-        for paper in papers:
-            try:
-                # Create custom screening prompt
-                prompt = f"""
+        # Screen papers with custom criteria, rating them concurrently
+        semaphore = asyncio.Semaphore(ai_service.SCREENING_CONCURRENCY)
+        
+        async def rate_paper(paper: Paper) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    # Create custom screening prompt
+                    prompt = f"""
                 Based on the following criteria, evaluate this paper:
                 
                 Criteria: {column_criteria}
@@ -122,49 +180,49 @@ async def create_custom_screening_column(
                 Please rate as "Yes", "Maybe", or "No" based on whether the paper meets the criteria.
                 Only respond with one word: Yes, Maybe, or No.
                 """
-                
-                # Use AI service (simplified version)
-                if ai_service.openai_client:
-                    response = ai_service.openai_client.chat.completions.create(
-                        model="gpt-3.5-turbo",
-                        messages=[{"role": "user", "content": prompt}],
-                        max_tokens=10,
-                        temperature=0.1
-                    )
-                    ai_response = response.choices[0].message.content.strip().upper()
-                elif ai_service.anthropic_client:
-                    response = ai_service.anthropic_client.messages.create(
-                        model="claude-3-sonnet-20240229",
-                        max_tokens=10,
-                        messages=[{"role": "user", "content": prompt}]
-                    )
-                    ai_response = response.content[0].text.strip().upper()
-                else:
-                    ai_response = "MAYBE"  # Fallback
-                
-                # Ensure valid response
-                if ai_response not in ["YES", "MAYBE", "NO"]:
+                    
+                    # Use AI service (simplified version)
+                    if ai_service.async_openai_client:
+                        await ai_service.throttle_openai(prompt, 10)
+                        response = await ai_service.async_openai_client.chat.completions.create(
+                            model=OPENAI_MODEL,
+                            messages=[{"role": "user", "content": prompt}],
+                            max_tokens=10,
+                            temperature=0.1
+                        )
+                        ai_response = response.choices[0].message.content.strip().upper()
+                    elif ai_service.async_anthropic_client:
+                        response = await ai_service.async_anthropic_client.messages.create(
+                            model="claude-3-sonnet-20240229",
+                            max_tokens=10,
+                            messages=[{"role": "user", "content": prompt}]
+                        )
+                        ai_response = response.content[0].text.strip().upper()
+                    else:
+                        ai_response = "MAYBE"  # Fallback
+                    
+                    # Ensure valid response
+                    if ai_response not in ["YES", "MAYBE", "NO"]:
+                        ai_response = "MAYBE"
+                    
+                except Exception as e:
+                    print(f"Error screening paper {paper.pmid}: {e}")
                     ai_response = "MAYBE"
                 
-                custom_results.append({
+                return {
                     "pmid": paper.pmid,
                     "title": paper.title,
                     column_name: ai_response
-                })
-                
-            except Exception as e:
-                print(f"Error screening paper {paper.pmid}: {e}")
-                custom_results.append({
-                    "pmid": paper.pmid,
-                    "title": paper.title,
-                    column_name: "MAYBE"
-                })
+                }
+        
+        custom_results = await asyncio.gather(*(rate_paper(paper) for paper in papers))
         
-        return {
+        # Plain JSON-ready values, so hand them straight to orjson rather than jsonable_encoder
+        return ORJSONResponse({
             "column_name": column_name,
             "criteria": column_criteria,
             "results": custom_results
-        }
+        })
         
     except HTTPException:
         raise
@@ -173,31 +231,31 @@ async def create_custom_screening_column(
 
 @router.get("/screening-results/{question_id}")
 async def get_screening_results(
-    question_id: str,
+    question_id: uuid.UUID,
     min_score: float = 0.0,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get screening results for a research question with optional score filtering
     """
     try:
         # Verify research question exists
-        research_question = db.query(ResearchQuestion).filter(
-            ResearchQuestion.id == question_id
-        ).first()
+        research_question = await get_question(db, question_id)
         if not research_question:
             raise HTTPException(status_code=404, detail="Research question not found")
         
         # Get papers with screening results
-        query = db.query(Paper).filter(
+        query = select(Paper).options(
+            load_only(Paper.pmid, Paper.title, Paper.score, Paper.screening_json)
+        ).where(
             Paper.question_id == question_id,
-            Paper.screening_json.isnot(None)
+            Paper.is_screened
         )
         
         if min_score > 0:
-            query = query.filter(Paper.score >= min_score)
+            query = query.where(Paper.score >= min_score)
         
-        papers = query.all()
+        papers = (await db.execute(query)).scalars().all()
         
         # Format results
         results = []
@@ -211,12 +269,12 @@ async def get_screening_results(
             }
             results.append(result)
         
-        return {
+        return ORJSONResponse({
             "question_id": question_id,
             "total_screened": len(results),
             "min_score_filter": min_score,
             "results": results
-        }
+        })
         
     except HTTPException:
         raise
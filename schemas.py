@@ -1,6 +1,7 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+from uuid import UUID
 
 class PICOCriteria(BaseModel):
     population: Optional[str] = None
@@ -13,12 +14,14 @@ class ResearchQuestionRequest(BaseModel):
     pico: Optional[PICOCriteria] = None
 
 class ResearchQuestionResponse(BaseModel):
-    question_id: str
+    question_id: UUID
     rephrased_question: str
     original_question: str
     pico_suggestions: Optional[Dict[str, Any]] = None
 
 class PaperBase(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
     pmid: str
     title: Optional[str] = None
     abstract: Optional[str] = None
@@ -27,6 +30,11 @@ class PaperBase(BaseModel):
     doi: Optional[str] = None
     mesh_terms: Optional[List[str]] = None
     pdf_link: Optional[str] = None
+    
+    @field_validator('mesh_terms', mode='before')
+    @classmethod
+    def mesh_terms_list(cls, value):
+        return value or []
 
 class PaperResponse(PaperBase):
     pass
@@ -37,7 +45,7 @@ class PubMedSearchResponse(BaseModel):
     query_translation: str
 
 class ScreeningRequest(BaseModel):
-    question_id: str
+    question_id: UUID
     papers: List[Dict[str, Any]]
 
 class ScreenedPaper(BaseModel):
@@ -53,6 +61,8 @@ class ScreeningResponse(BaseModel):
     screened_papers: List[ScreenedPaper]
 
 class FilteredPaperResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
     pmid: str
     score: float
     title: Optional[str] = None
@@ -63,6 +73,8 @@ class DataExtractionRequest(BaseModel):
     paper_ids: List[str]
 
 class ExtractedData(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
     pmid: str
     study_design: Optional[str] = None
     patient_characteristics: Optional[str] = None
@@ -75,4 +87,11 @@ class DataExtractionResponse(BaseModel):
     extracted_data: List[ExtractedData]
 
 class ReportResponse(BaseModel):
-    report_url: str
\ No newline at end of file
+    report_url: str
+
+class ReportJobResponse(BaseModel):
+    job_id: UUID
+    status: str
+    status_url: str
+    report_url: Optional[str] = None
+    error: Optional[str] = None
\ No newline at end of file
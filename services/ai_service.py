@@ -1,42 +1,109 @@
 import openai
 import anthropic
+import asyncio
+import copy
+import hashlib
+import orjson
 import os
-from typing import Dict, Any, List, Optional
+import re
+from collections import OrderedDict
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
 from dotenv import load_dotenv
+from utils.rate_limit import RateLimiter
 
 load_dotenv()
 
+# Stalled model calls are cut off and retried (with the SDKs' backoff) rather than holding up a batch
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "15"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# OpenAI account limits, paced client-side so large batches wait instead of collecting 429s (0 = off)
+OPENAI_RPM = float(os.getenv("OPENAI_RPM", "0"))
+OPENAI_TPM = float(os.getenv("OPENAI_TPM", "0"))
+# One budget for the whole process, shared by the AIService of every router
+_openai_limiter = RateLimiter(OPENAI_RPM, OPENAI_TPM) if OPENAI_RPM and OPENAI_TPM else None
+# Batched calls use structured outputs, so the model must support json_schema responses
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+# "LABEL: value" lines of the plain-text response formats, matched in one pass over the response
+_QUESTION_LINE_RE = re.compile(r'^\s*(REPHRASED|MESH_TERMS|SUGGESTED_PICO):(.*)$')
+_PICO_LINE_RE = re.compile(r'^\s*- (Population|Intervention|Comparison|Outcome):(.*)$')
+_SCREENING_LINE_RE = re.compile(
+    r'^\s*(STUDY_DESIGN|INTERVENTION|POPULATION|OUTCOMES|TREATMENT_CHARACTERISTICS)\s*:(.*)$',
+    re.MULTILINE | re.IGNORECASE
+)
+_EXTRACTION_LINE_RE = re.compile(
+    r'^\s*(STUDY_DESIGN|PATIENT_CHARACTERISTICS|TREATMENT_CHARACTERISTICS|INTERVENTION|COMPARISON|OUTCOMES):(.*)$',
+    re.MULTILINE | re.IGNORECASE
+)
+
+def _batch_response_format(name: str, properties: Dict[str, Any]) -> Dict[str, Any]:
+    """Strict structured-output format for a batch answered as {"results": [...]}, one entry per paper"""
+    entry = {
+        "type": "object",
+        "properties": {"pmid": {"type": "string"}, **properties},
+        "required": ["pmid", *properties],
+        "additionalProperties": False
+    }
+    schema = {
+        "type": "object",
+        "properties": {"results": {"type": "array", "items": entry}},
+        "required": ["results"],
+        "additionalProperties": False
+    }
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
 class AIService:
-    def __init__(self):
-        self.openai_client = None
-        self.anthropic_client = None
-        
-        # Initialize OpenAI if API key is available
-        openai_key = os.getenv("OPENAI_API_KEY")
-        if openai_key and openai_key != "your_openai_api_key_here":
-            openai.api_key = openai_key
-            self.openai_client = openai
-        
-        # Initialize Anthropic if API key is available
-        anthropic_key = os.getenv("ANTHROPIC_API_KEY")
-        if anthropic_key and anthropic_key != "your_anthropic_api_key_here":
-            self.anthropic_client = anthropic.Anthropic(api_key=anthropic_key)
-    
-    def rephrase_research_question(self, question: str, pico: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """
-        Rephrase research question for better specificity using AI
-        """
-        if pico:
-            prompt = f"""
+    # Concurrent extraction requests allowed per call, to stay within provider rate limits
+    EXTRACTION_CONCURRENCY = 8
+    # Custom screening asks for a one-word answer, so more of those can be in flight
+    SCREENING_CONCURRENCY = 20
+    # Criteria screening answers five questions per paper, so it sits between the two
+    CRITERIA_SCREENING_CONCURRENCY = 12
+    # Screening response labels and the result keys they fill, and the points each answer scores
+    SCREENING_FIELDS = {
+        "STUDY_DESIGN": "study_design",
+        "INTERVENTION": "intervention",
+        "POPULATION": "population",
+        "OUTCOMES": "outcomes",
+        "TREATMENT_CHARACTERISTICS": "treatment_characteristics"
+    }
+    SCREENING_POINTS = {"YES": 1.0, "MAYBE": 0.5}
+    EXTRACTION_FIELDS = [
+        "study_design",
+        "patient_characteristics",
+        "treatment_characteristics",
+        "intervention",
+        "comparison",
+        "outcomes"
+    ]
+    # OpenAI response formats for the batched calls, so every answer parses and fits its field
+    SCREENING_BATCH_FORMAT = _batch_response_format(
+        "screening_results",
+        {key: {"type": "string", "enum": ["Yes", "Maybe", "No"]} for key in SCREENING_FIELDS.values()}
+    )
+    EXTRACTION_BATCH_FORMAT = _batch_response_format(
+        "extraction_results",
+        {key: {"type": "string"} for key in EXTRACTION_FIELDS}
+    )
+    # Papers sent together in one completion; the concurrency limits above count these batches
+    SCREENING_BATCH_SIZE = 8
+    EXTRACTION_BATCH_SIZE = 4
+    # A batch answers for several papers, so it gets longer before it counts as stalled
+    BATCH_TIMEOUT_FACTOR = 3
+    # Rephrasings kept in process, keyed by prompt, so a repeated question skips the model
+    REPHRASE_CACHE_SIZE = 256
+    # Question rephrasing prompts, filled in with str.format
+    PICO_FIELDS = ("population", "intervention", "comparison", "outcome")
+    REPHRASE_WITH_PICO_PROMPT = """
             Rephrase the following research question to be more specific and suitable for PubMed search.
             
             Original question: {question}
             
             PICO criteria provided:
-            - Population: {pico.get('population', 'Not specified')}
-            - Intervention: {pico.get('intervention', 'Not specified')}
-            - Comparison: {pico.get('comparison', 'Not specified')}
-            - Outcome: {pico.get('outcome', 'Not specified')}
+            - Population: {population}
+            - Intervention: {intervention}
+            - Comparison: {comparison}
+            - Outcome: {outcome}
             
             Please provide:
             1. A rephrased question that incorporates the PICO elements more clearly
@@ -46,8 +113,7 @@ class AIService:
             REPHRASED: [your rephrased question]
             MESH_TERMS: [comma-separated list of suggested MeSH terms]
             """
-        else:
-            prompt = f"""
+    REPHRASE_PROMPT = """
             Rephrase the following research question to be more specific and suitable for PubMed search.
             
             Original question: {question}
@@ -67,11 +133,62 @@ class AIService:
             REPHRASED: [your rephrased question]
             MESH_TERMS: [comma-separated list of suggested MeSH terms]
             """
+    # Canned screening answer used when no AI provider is configured
+    DEMO_SCREENING_RESPONSE = "STUDY_DESIGN: Maybe\nINTERVENTION: Yes\nPOPULATION: Maybe\nOUTCOMES: Yes\nTREATMENT_CHARACTERISTICS: Maybe"
+    
+    def __init__(self):
+        self.openai_client = None
+        self.anthropic_client = None
+        self.async_openai_client = None
+        self.async_anthropic_client = None
+        self.openai_limiter = _openai_limiter
+        self._rephrasings: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        
+        # Initialize OpenAI if API key is available
+        openai_key = os.getenv("OPENAI_API_KEY")
+        if openai_key and openai_key != "your_openai_api_key_here":
+            client_options = {"api_key": openai_key, "timeout": LLM_REQUEST_TIMEOUT, "max_retries": LLM_MAX_RETRIES}
+            self.openai_client = openai.OpenAI(**client_options)
+            self.async_openai_client = openai.AsyncOpenAI(**client_options)
+        
+        # Initialize Anthropic if API key is available
+        anthropic_key = os.getenv("ANTHROPIC_API_KEY")
+        if anthropic_key and anthropic_key != "your_anthropic_api_key_here":
+            client_options = {"api_key": anthropic_key, "timeout": LLM_REQUEST_TIMEOUT, "max_retries": LLM_MAX_RETRIES}
+            self.anthropic_client = anthropic.Anthropic(**client_options)
+            self.async_anthropic_client = anthropic.AsyncAnthropic(**client_options)
+    
+    async def throttle_openai(self, prompt: str, max_tokens: int):
+        """Wait for room in the OpenAI rate budgets before a request, when limits are configured"""
+        if self.openai_limiter:
+            # Roughly four characters per prompt token, plus the completion the request may use
+            await self.openai_limiter.acquire(len(prompt) // 4 + max_tokens)
+    
+    @property
+    def has_provider(self) -> bool:
+        """Whether answers come from a model rather than the demo fallbacks"""
+        return bool(self.openai_client or self.anthropic_client)
+    
+    def rephrase_research_question(self, question: str, pico: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Rephrase research question for better specificity using AI
+        """
+        if pico:
+            # PICO fields left unset arrive as None and should read as unspecified, not "None"
+            pico_fields = {field: pico.get(field) or 'Not specified' for field in self.PICO_FIELDS}
+            prompt = self.REPHRASE_WITH_PICO_PROMPT.format(question=question, **pico_fields)
+        else:
+            prompt = self.REPHRASE_PROMPT.format(question=question)
+        
+        prompt_key = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        if prompt_key in self._rephrasings:
+            self._rephrasings.move_to_end(prompt_key)
+            return copy.deepcopy(self._rephrasings[prompt_key])
         
         try:
             if self.openai_client:
                 response = self.openai_client.chat.completions.create(
-                    model="gpt-3.5-turbo",
+                    model=OPENAI_MODEL,
                     messages=[{"role": "user", "content": prompt}],
                     max_tokens=500,
                     temperature=0.3
@@ -88,7 +205,12 @@ class AIService:
                 # Fallback for demo purposes
                 ai_response = f"REPHRASED: {question} - systematic review and meta-analysis\nMESH_TERMS: systematic review, meta-analysis, clinical trial"
             
-            return self._parse_ai_response(ai_response, question, pico)
+            result = self._parse_ai_response(ai_response, question, pico)
+            if self.has_provider:
+                self._rephrasings[prompt_key] = result
+                while len(self._rephrasings) > self.REPHRASE_CACHE_SIZE:
+                    self._rephrasings.popitem(last=False)
+            return copy.deepcopy(result)
             
         except Exception as e:
             print(f"AI service error: {e}")
@@ -113,39 +235,144 @@ class AIService:
         }
         
         lines = response.split('\n')
-        for line in lines:
-            line = line.strip()
-            if line.startswith('REPHRASED:'):
-                result["rephrased_question"] = line.replace('REPHRASED:', '').strip()
-            elif line.startswith('MESH_TERMS:'):
-                mesh_terms = line.replace('MESH_TERMS:', '').strip()
-                result["mesh_terms"] = [term.strip() for term in mesh_terms.split(',')]
-            elif line.startswith('SUGGESTED_PICO:') and not pico:
+        for idx, line in enumerate(lines):
+            match = _QUESTION_LINE_RE.match(line)
+            if not match:
+                continue
+            label, value = match.group(1), match.group(2).strip()
+            if label == 'REPHRASED':
+                result["rephrased_question"] = value
+            elif label == 'MESH_TERMS':
+                result["mesh_terms"] = [term.strip() for term in value.split(',')]
+            elif not pico:
                 # Parse PICO suggestions
                 pico_suggestions = {}
-                idx = lines.index(line)
                 for i in range(idx + 1, min(idx + 5, len(lines))):
-                    if lines[i].strip().startswith('- Population:'):
-                        pico_suggestions["population"] = lines[i].replace('- Population:', '').strip()
-                    elif lines[i].strip().startswith('- Intervention:'):
-                        pico_suggestions["intervention"] = lines[i].replace('- Intervention:', '').strip()
-                    elif lines[i].strip().startswith('- Comparison:'):
-                        pico_suggestions["comparison"] = lines[i].replace('- Comparison:', '').strip()
-                    elif lines[i].strip().startswith('- Outcome:'):
-                        pico_suggestions["outcome"] = lines[i].replace('- Outcome:', '').strip()
+                    pico_match = _PICO_LINE_RE.match(lines[i])
+                    if pico_match:
+                        pico_suggestions[pico_match.group(1).lower()] = pico_match.group(2).strip()
                 result["pico_suggestions"] = pico_suggestions
         
         return result
     
-    def screen_papers(self, papers: List[Dict[str, Any]], research_question: str) -> List[Dict[str, Any]]:
+    def screen_papers_iter(self, papers: List[Dict[str, Any]], research_question: str) -> AsyncIterator[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        Screen papers concurrently in batches, yielding (index of the batch's first paper, its results)
+        as each batch finishes
+        
+        Batches come in completion order, so callers can save them while later batches are
+        still with the model.
+        """
+        return self._run_batches(
+            papers, self.SCREENING_BATCH_SIZE, self.CRITERIA_SCREENING_CONCURRENCY,
+            lambda batch: self.screen_batch(batch, research_question)
+        )
+    
+    async def _run_batches(
+        self,
+        papers: List[Dict[str, Any]],
+        batch_size: int,
+        concurrency: int,
+        run_batch: Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]]
+    ) -> AsyncIterator[Tuple[int, List[Dict[str, Any]]]]:
+        """Run papers through run_batch in batches, yielding (first paper index, results) as each batch finishes"""
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def run_limited(start: int) -> Tuple[int, List[Dict[str, Any]]]:
+            async with semaphore:
+                return start, await run_batch(papers[start:start + batch_size])
+        
+        tasks = [asyncio.ensure_future(run_limited(start)) for start in range(0, len(papers), batch_size)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            # A caller that stops iterating early should not leave batches running
+            for task in tasks:
+                task.cancel()
+    
+    async def screen_batch(self, papers: List[Dict[str, Any]], research_question: str) -> List[Dict[str, Any]]:
         """
-        Screen papers using AI to generate screening columns
+        Screen several papers with one completion, screening any paper it misses on its own
         """
-        screened_papers = []
+        if len(papers) == 1 or not (self.async_openai_client or self.async_anthropic_client):
+            return [await self.screen_one(paper, research_question) for paper in papers]
+        
+        try:
+            prompt = self._screening_batch_prompt(papers, research_question)
+            answers = await self._complete_batch(prompt, 100 * len(papers) + 100, self.SCREENING_BATCH_FORMAT)
+        except Exception as e:
+            print(f"Error screening batch of {len(papers)} papers: {e}")
+            answers = {}
         
+        results = []
         for paper in papers:
-            try:
-                prompt = f"""
+            pmid = paper.get('pmid', '')
+            if isinstance(answers.get(pmid), dict):
+                results.append(self._screening_result(pmid, answers[pmid]))
+            else:
+                results.append(await self.screen_one(paper, research_question))
+        return results
+    
+    async def screen_one(self, paper: Dict[str, Any], research_question: str) -> Dict[str, Any]:
+        """
+        Screen a single paper against the research question without blocking the event loop
+        """
+        try:
+            prompt = self._screening_prompt(paper, research_question)
+            
+            if self.async_openai_client:
+                await self.throttle_openai(prompt, 200)
+                ai_response = await self._stream_screening(prompt)
+            elif self.async_anthropic_client:
+                response = await self.async_anthropic_client.messages.create(
+                    model="claude-3-sonnet-20240229",
+                    max_tokens=200,
+                    messages=[{"role": "user", "content": prompt}]
+                )
+                ai_response = response.content[0].text
+            else:
+                # Fallback for demo
+                ai_response = self.DEMO_SCREENING_RESPONSE
+            
+            return self._parse_screening_response(ai_response, paper.get('pmid', ''))
+            
+        except Exception as e:
+            print(f"Error screening paper {paper.get('pmid', 'unknown')}: {e}")
+            return self.fallback_screening(paper)
+    
+    async def _stream_screening(self, prompt: str) -> str:
+        """Stream a screening completion, hanging up once every criterion has a complete answer line"""
+        stream = await self.async_openai_client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=200,
+            temperature=0.1,
+            stream=True
+        )
+        ai_response = ""
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                ai_response += delta
+                if '\n' not in delta:
+                    continue
+                # Anything after the fifth answer is commentary the parser ignores
+                answered = {
+                    match.group(1).upper() for match in _SCREENING_LINE_RE.finditer(ai_response)
+                    if match.end() < len(ai_response)
+                }
+                if len(answered) == len(self.SCREENING_FIELDS):
+                    break
+        finally:
+            await stream.response.aclose()
+        return ai_response
+    
+    def _screening_prompt(self, paper: Dict[str, Any], research_question: str) -> str:
+        """Build the screening prompt for a paper"""
+        return f"""
                 Based on the research question and paper details below, please evaluate this paper for inclusion in a systematic review.
                 
                 Research Question: {research_question}
@@ -169,43 +396,56 @@ class AIService:
                 OUTCOMES: [Yes/Maybe/No]
                 TREATMENT_CHARACTERISTICS: [Yes/Maybe/No]
                 """
+    
+    def _screening_batch_prompt(self, papers: List[Dict[str, Any]], research_question: str) -> str:
+        """Build the screening prompt for several papers, answered as JSON"""
+        paper_details = orjson.dumps([
+            {"pmid": paper.get('pmid', ''), "title": paper.get('title', 'N/A'), "abstract": (paper.get('abstract') or 'N/A')[:1000]}
+            for paper in papers
+        ]).decode()
+        return f"""
+                Based on the research question and paper details below, please evaluate each paper for inclusion in a systematic review.
                 
-                if self.openai_client:
-                    response = self.openai_client.chat.completions.create(
-                        model="gpt-3.5-turbo",
-                        messages=[{"role": "user", "content": prompt}],
-                        max_tokens=200,
-                        temperature=0.1
-                    )
-                    ai_response = response.choices[0].message.content
-                elif self.anthropic_client:
-                    response = self.anthropic_client.messages.create(
-                        model="claude-3-sonnet-20240229",
-                        max_tokens=200,
-                        messages=[{"role": "user", "content": prompt}]
-                    )
-                    ai_response = response.content[0].text
-                else:
-                    # Fallback for demo
-                    ai_response = "STUDY_DESIGN: Maybe\nINTERVENTION: Yes\nPOPULATION: Maybe\nOUTCOMES: Yes\nTREATMENT_CHARACTERISTICS: Maybe"
+                Research Question: {research_question}
+                
+                Papers (JSON):
+                {paper_details}
                 
-                screening_result = self._parse_screening_response(ai_response, paper.get('pmid', ''))
-                screened_papers.append(screening_result)
+                Please rate each criterion as "Yes", "Maybe", or "No" for every paper:
                 
-            except Exception as e:
-                print(f"Error screening paper {paper.get('pmid', 'unknown')}: {e}")
-                # Fallback screening
-                screened_papers.append({
-                    "pmid": paper.get('pmid', ''),
-                    "study_design": "Maybe",
-                    "intervention": "Maybe",
-                    "population": "Maybe",
-                    "outcomes": "Maybe",
-                    "treatment_characteristics": "Maybe",
-                    "score": 2.5
-                })
+                1. study_design: Is this an appropriate study design (RCT, cohort, case-control, etc.)?
+                2. intervention: Does the study evaluate the relevant intervention?
+                3. population: Does the study include the target population?
+                4. outcomes: Does the study measure relevant outcomes?
+                5. treatment_characteristics: Are treatment details adequately described?
+                
+                Respond with only a JSON object of the form:
+                {{"results": [{{"pmid": "...", "study_design": "Yes", "intervention": "Maybe", "population": "No", "outcomes": "Yes", "treatment_characteristics": "Maybe"}}]}}
+                with one entry per paper.
+                """
+    
+    def _screening_result(self, pmid: str, answers: Dict[str, Any]) -> Dict[str, Any]:
+        """Screening result for a paper from its JSON answers"""
+        result = {"pmid": pmid}
+        for key in self.SCREENING_FIELDS.values():
+            result[key] = str(answers.get(key) or "Maybe").strip().upper()
         
-        return screened_papers
+        points = self.SCREENING_POINTS
+        result["score"] = sum(points.get(result[key], 0.0) for key in self.SCREENING_FIELDS.values())
+        return result
+    
+    def fallback_screening(self, paper: Dict[str, Any]) -> Dict[str, Any]:
+        """Fallback screening when the AI call fails, marked so callers do not keep it"""
+        return {
+            "pmid": paper.get('pmid', ''),
+            "fallback": True,
+            "study_design": "Maybe",
+            "intervention": "Maybe",
+            "population": "Maybe",
+            "outcomes": "Maybe",
+            "treatment_characteristics": "Maybe",
+            "score": 2.5
+        }
     
     def _parse_screening_response(self, response: str, pmid: str) -> Dict[str, Any]:
         """Parse AI screening response"""
@@ -219,41 +459,81 @@ class AIService:
             "score": 0.0
         }
         
-        lines = response.split('\n')
-        for line in lines:
-            line = line.strip().upper()
-            if line.startswith('STUDY_DESIGN:'):
-                result["study_design"] = line.replace('STUDY_DESIGN:', '').strip()
-            elif line.startswith('INTERVENTION:'):
-                result["intervention"] = line.replace('INTERVENTION:', '').strip()
-            elif line.startswith('POPULATION:'):
-                result["population"] = line.replace('POPULATION:', '').strip()
-            elif line.startswith('OUTCOMES:'):
-                result["outcomes"] = line.replace('OUTCOMES:', '').strip()
-            elif line.startswith('TREATMENT_CHARACTERISTICS:'):
-                result["treatment_characteristics"] = line.replace('TREATMENT_CHARACTERISTICS:', '').strip()
+        for match in _SCREENING_LINE_RE.finditer(response):
+            result[self.SCREENING_FIELDS[match.group(1).upper()]] = match.group(2).strip().upper()
         
         # Calculate score: Yes=1, Maybe=0.5, No=0
-        score = 0.0
-        for key in ["study_design", "intervention", "population", "outcomes", "treatment_characteristics"]:
-            value = result[key].upper()
-            if value == "YES":
-                score += 1.0
-            elif value == "MAYBE":
-                score += 0.5
-        
-        result["score"] = score
+        points = self.SCREENING_POINTS
+        result["score"] = sum(points.get(result[key].upper(), 0.0) for key in self.SCREENING_FIELDS.values())
         return result
     
-    def extract_data(self, papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def extract_data_iter(self, papers: List[Dict[str, Any]]) -> AsyncIterator[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        Extract structured meta-analysis data from papers concurrently in batches, yielding
+        (index of the batch's first paper, its results) as each batch finishes
+        """
+        return self._run_batches(papers, self.EXTRACTION_BATCH_SIZE, self.EXTRACTION_CONCURRENCY, self.extract_batch)
+    
+    async def extract_batch(self, papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        Extract structured meta-analysis data from papers
+        Extract data from several papers with one completion, extracting any paper it misses on its own
         """
-        extracted_data = []
+        if len(papers) == 1 or not (self.async_openai_client or self.async_anthropic_client):
+            return [await self.extract_one(paper) for paper in papers]
+        
+        try:
+            answers = await self._complete_batch(
+                self._extraction_batch_prompt(papers), 400 * len(papers), self.EXTRACTION_BATCH_FORMAT
+            )
+        except Exception as e:
+            print(f"Error extracting data from batch of {len(papers)} papers: {e}")
+            answers = {}
         
+        results = []
         for paper in papers:
-            try:
-                prompt = f"""
+            pmid = paper.get('pmid', '')
+            if isinstance(answers.get(pmid), dict):
+                results.append(self._extraction_result(pmid, answers[pmid]))
+            else:
+                results.append(await self.extract_one(paper))
+        return results
+    
+    async def extract_one(self, paper: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Extract structured meta-analysis data from a single paper without blocking the event loop
+        """
+        try:
+            prompt = self._extraction_prompt(paper)
+            
+            if self.async_openai_client:
+                await self.throttle_openai(prompt, 400)
+                response = await self.async_openai_client.chat.completions.create(
+                    model=OPENAI_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=400,
+                    temperature=0.1
+                )
+                ai_response = response.choices[0].message.content
+            elif self.async_anthropic_client:
+                response = await self.async_anthropic_client.messages.create(
+                    model="claude-3-sonnet-20240229",
+                    max_tokens=400,
+                    messages=[{"role": "user", "content": prompt}]
+                )
+                ai_response = response.content[0].text
+            else:
+                # Fallback for demo
+                ai_response = self._demo_extraction_response(paper)
+            
+            return self._parse_extraction_response(ai_response, paper.get('pmid', ''))
+            
+        except Exception as e:
+            print(f"Error extracting data from paper {paper.get('pmid', 'unknown')}: {e}")
+            return self.fallback_extraction(paper)
+    
+    def _extraction_prompt(self, paper: Dict[str, Any]) -> str:
+        """Build the data extraction prompt for a paper"""
+        return f"""
                 Extract the following structured data from this research paper for meta-analysis:
                 
                 Title: {paper.get('title', 'N/A')}
@@ -275,43 +555,85 @@ class AIService:
                 COMPARISON: [description]
                 OUTCOMES: [description]
                 """
+    
+    def _extraction_batch_prompt(self, papers: List[Dict[str, Any]]) -> str:
+        """Build the data extraction prompt for several papers, answered as JSON"""
+        paper_details = orjson.dumps([
+            {"pmid": paper.get('pmid', ''), "title": paper.get('title', 'N/A'), "abstract": (paper.get('abstract') or 'N/A')[:1500]}
+            for paper in papers
+        ]).decode()
+        return f"""
+                Extract the following structured data from each of these research papers for meta-analysis:
                 
-                if self.openai_client:
-                    response = self.openai_client.chat.completions.create(
-                        model="gpt-3.5-turbo",
-                        messages=[{"role": "user", "content": prompt}],
-                        max_tokens=400,
-                        temperature=0.1
-                    )
-                    ai_response = response.choices[0].message.content
-                elif self.anthropic_client:
-                    response = self.anthropic_client.messages.create(
-                        model="claude-3-sonnet-20240229",
-                        max_tokens=400,
-                        messages=[{"role": "user", "content": prompt}]
-                    )
-                    ai_response = response.content[0].text
-                else:
-                    # Fallback for demo
-                    ai_response = f"STUDY_DESIGN: Clinical study\nPATIENT_CHARACTERISTICS: Not specified in abstract\nTREATMENT_CHARACTERISTICS: Not specified\nINTERVENTION: {paper.get('title', 'Study intervention')}\nCOMPARISON: Control group\nOUTCOMES: Primary and secondary outcomes measured"
+                Papers (JSON):
+                {paper_details}
                 
-                extraction_result = self._parse_extraction_response(ai_response, paper.get('pmid', ''))
-                extracted_data.append(extraction_result)
+                Please extract:
+                1. study_design (e.g., RCT, cohort study, case-control)
+                2. patient_characteristics (sample size, demographics, inclusion criteria)
+                3. treatment_characteristics (dosage, duration, administration)
+                4. intervention details
+                5. comparison/control details
+                6. outcomes measured and results
                 
-            except Exception as e:
-                print(f"Error extracting data from paper {paper.get('pmid', 'unknown')}: {e}")
-                # Fallback extraction
-                extracted_data.append({
-                    "pmid": paper.get('pmid', ''),
-                    "study_design": "Not specified",
-                    "patient_characteristics": "Not specified",
-                    "treatment_characteristics": "Not specified",
-                    "intervention": paper.get('title', 'Not specified')[:100],
-                    "comparison": "Not specified",
-                    "outcomes": "Not specified"
-                })
+                Respond with only a JSON object of the form:
+                {{"results": [{{"pmid": "...", "study_design": "...", "patient_characteristics": "...", "treatment_characteristics": "...", "intervention": "...", "comparison": "...", "outcomes": "..."}}]}}
+                with one entry per paper.
+                """
+    
+    def _extraction_result(self, pmid: str, answers: Dict[str, Any]) -> Dict[str, Any]:
+        """Extraction result for a paper from its JSON answers"""
+        result = {"pmid": pmid}
+        for key in self.EXTRACTION_FIELDS:
+            result[key] = str(answers.get(key) or "Not specified").strip()
+        return result
+    
+    async def _complete_batch(self, prompt: str, max_tokens: int, response_format: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Send a batch prompt to the configured provider and return its JSON results keyed by PMID"""
+        if self.async_openai_client:
+            await self.throttle_openai(prompt, max_tokens)
+            response = await self.async_openai_client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=0.1,
+                response_format=response_format,
+                timeout=LLM_REQUEST_TIMEOUT * self.BATCH_TIMEOUT_FACTOR
+            )
+            ai_response = response.choices[0].message.content
+        else:
+            response = await self.async_anthropic_client.messages.create(
+                model="claude-3-sonnet-20240229",
+                max_tokens=max_tokens,
+                messages=[{"role": "user", "content": prompt}],
+                timeout=LLM_REQUEST_TIMEOUT * self.BATCH_TIMEOUT_FACTOR
+            )
+            ai_response = response.content[0].text
         
-        return extracted_data
+        # Anthropic has no JSON mode, so allow for text around the object
+        data = orjson.loads(ai_response[ai_response.find('{'):ai_response.rfind('}') + 1])
+        return {
+            str(entry.get('pmid')): entry
+            for entry in data.get('results', [])
+            if isinstance(entry, dict)
+        }
+    
+    def _demo_extraction_response(self, paper: Dict[str, Any]) -> str:
+        """Canned extraction used when no AI provider is configured"""
+        return f"STUDY_DESIGN: Clinical study\nPATIENT_CHARACTERISTICS: Not specified in abstract\nTREATMENT_CHARACTERISTICS: Not specified\nINTERVENTION: {paper.get('title', 'Study intervention')}\nCOMPARISON: Control group\nOUTCOMES: Primary and secondary outcomes measured"
+    
+    def fallback_extraction(self, paper: Dict[str, Any]) -> Dict[str, Any]:
+        """Fallback extraction when the AI call fails, marked so callers do not keep it"""
+        return {
+            "pmid": paper.get('pmid', ''),
+            "fallback": True,
+            "study_design": "Not specified",
+            "patient_characteristics": "Not specified",
+            "treatment_characteristics": "Not specified",
+            "intervention": (paper.get('title') or 'Not specified')[:100],
+            "comparison": "Not specified",
+            "outcomes": "Not specified"
+        }
     
     def _parse_extraction_response(self, response: str, pmid: str) -> Dict[str, Any]:
         """Parse AI extraction response"""
@@ -325,20 +647,7 @@ class AIService:
             "outcomes": "Not specified"
         }
         
-        lines = response.split('\n')
-        for line in lines:
-            line = line.strip()
-            if line.upper().startswith('STUDY_DESIGN:'):
-                result["study_design"] = line[len('STUDY_DESIGN:'):].strip()
-            elif line.upper().startswith('PATIENT_CHARACTERISTICS:'):
-                result["patient_characteristics"] = line[len('PATIENT_CHARACTERISTICS:'):].strip()
-            elif line.upper().startswith('TREATMENT_CHARACTERISTICS:'):
-                result["treatment_characteristics"] = line[len('TREATMENT_CHARACTERISTICS:'):].strip()
-            elif line.upper().startswith('INTERVENTION:'):
-                result["intervention"] = line[len('INTERVENTION:'):].strip()
-            elif line.upper().startswith('COMPARISON:'):
-                result["comparison"] = line[len('COMPARISON:'):].strip()
-            elif line.upper().startswith('OUTCOMES:'):
-                result["outcomes"] = line[len('OUTCOMES:'):].strip()
+        for match in _EXTRACTION_LINE_RE.finditer(response):
+            result[match.group(1).lower()] = match.group(2).strip()
         
         return result
\ No newline at end of file
@@ -1,6 +1,9 @@
 import requests
-import xml.etree.ElementTree as ET
+from lxml import etree as ET
+import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Tuple
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
@@ -10,36 +13,86 @@ from dotenv import load_dotenv
 load_dotenv()
 
 class PubMedService:
+    # XPath expressions are compiled once and evaluated by libxml2, returning plain strings
+    _xp_query_translation = ET.XPath('(.//QueryTranslation)[1]/text()', smart_strings=False)
+    _xp_count = ET.XPath('(.//Count)[1]/text()', smart_strings=False)
+    _xp_ids = ET.XPath('.//IdList/Id/text()', smart_strings=False)
+    _maintenance_re = re.compile(rb'maintenance|down_bethesda|302 found|document has moved', re.IGNORECASE)
+    # Article fields are read along their fixed paths under PubmedArticle instead of
+    # searching every descendant for each field
+    _xp_pmid = ET.XPath('./MedlineCitation/PMID/text()', smart_strings=False)
+    _xp_title = ET.XPath('./MedlineCitation/Article/ArticleTitle')
+    _xp_abstract_texts = ET.XPath('./MedlineCitation/Article/Abstract/AbstractText')
+    _xp_authors = ET.XPath('./MedlineCitation/Article/AuthorList/Author')
+    _xp_doi = ET.XPath('./MedlineCitation/Article/ELocationID[@EIdType="doi"]/text()', smart_strings=False)
+    _xp_pub_date = ET.XPath('./MedlineCitation/Article/Journal/JournalIssue/PubDate')
+    _xp_mesh_terms = ET.XPath('./MedlineCitation/MeshHeadingList/MeshHeading/DescriptorName/text()', smart_strings=False)
+    
     def __init__(self):
         self.email = os.getenv("NCBI_EMAIL", "")
+        self.api_key = os.getenv("NCBI_API_KEY", "")
         self.base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
         
+        # NCBI allows 3 requests per second, or 10 with an API key; batches are fetched
+        # on that many threads, with every request spaced out on a shared schedule
+        self.requests_per_second = 10 if self.api_key else 3
+        self._next_request = 0.0
+        self._schedule_lock = threading.Lock()
+        
         # Set up session with retry strategy
         self.session = requests.Session()
+        # Waits as long as a 429/503 Retry-After asks, otherwise backs off with jitter so
+        # parallel fetches that failed together do not all retry together
         retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
+            total=5,
+            backoff_factor=0.5,
+            backoff_jitter=0.5,
             status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET'],
+            respect_retry_after_header=True,
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # One kept-alive connection per fetch thread, so parallel batches never wait on a socket
+        adapter = HTTPAdapter(pool_maxsize=self.requests_per_second, max_retries=retry_strategy)
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
     
+    def _with_credentials(self, params: Dict) -> Dict:
+        """Add the contact email and API key NCBI asks for, when configured"""
+        if self.email and '@' in self.email and '.' in self.email:
+            params['email'] = self.email
+        if self.api_key:
+            params['api_key'] = self.api_key
+        return params
+    
+    def _wait_for_slot(self):
+        """Block until this thread may send its next request within NCBI's rate limit"""
+        with self._schedule_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_request)
+            self._next_request = slot + 1 / self.requests_per_second
+        if slot > now:
+            time.sleep(slot - now)
+    
+    def _get(self, endpoint: str, params: Dict) -> requests.Response:
+        """Send a rate-limited E-utilities request"""
+        self._wait_for_slot()
+        response = self.session.get(f"{self.base_url}/{endpoint}", params=self._with_credentials(params), timeout=30)
+        response.raise_for_status()
+        return response
+    
     def _is_valid_xml_response(self, response_content: bytes) -> bool:
         """Check if the response content is valid XML"""
-        try:
-            content_str = response_content.decode('utf-8', errors='ignore').strip()
-            return content_str.startswith('<?xml') or content_str.startswith('<')
-        except Exception:
-            return False
+        # Only the first non-whitespace byte matters; a UTF-8 BOM may precede it
+        return response_content[:64].lstrip().lstrip(b'\xef\xbb\xbf').lstrip().startswith(b'<')
     
     def _is_maintenance_page(self, response_content: bytes) -> bool:
         """Check if the response is a maintenance page"""
-        try:
-            content_str = response_content.decode('utf-8', errors='ignore').lower()
-            return any(keyword in content_str for keyword in ['maintenance', 'down_bethesda', '302 found', 'document has moved'])
-        except Exception:
+        # Maintenance pages are short HTML documents, so the first 4KB is enough. E-utilities
+        # XML opens with a declaration, and its query text may itself mention "maintenance"
+        head = response_content[:4096]
+        if head.lstrip().lstrip(b'\xef\xbb\xbf').startswith(b'<?xml'):
             return False
+        return self._maintenance_re.search(head) is not None
     
     def search_papers(self, query: str, max_results: int = 100) -> Tuple[str, List[str], int]:
         """
@@ -56,12 +109,8 @@ class PubMedService:
             'sort': 'relevance'
         }
         
-        if self.email and '@' in self.email and '.' in self.email:
-            params['email'] = self.email
-        
         try:
-            response = self.session.get(f"{self.base_url}/esearch.fcgi", params=params, timeout=30)
-            response.raise_for_status()
+            response = self._get("esearch.fcgi", params)
             
             if self._is_maintenance_page(response.content):
                 print("❌ NCBI E-utilities API is currently under maintenance")
@@ -77,9 +126,9 @@ class PubMedService:
             return query, [], 0
         
         # Get translation and count
-        translation = root.findtext('.//QueryTranslation') or query
-        count_elem = root.find('.//Count')
-        total_count = int(count_elem.text) if count_elem is not None else 0
+        translation = next(iter(self._xp_query_translation(root)), None) or query
+        count_text = self._xp_count(root)
+        total_count = int(count_text[0]) if count_text else 0
         
         print(f"📊 Found {total_count} papers total")
         print(f"🔎 Query translation: {translation}")
@@ -87,46 +136,47 @@ class PubMedService:
         if total_count == 0:
             return translation, [], 0
         
-        # Get PMIDs (limited by max_results)
-        all_pmids = []
+        # Get PMIDs (limited by max_results), pages fetched concurrently and kept in relevance order
         batch_size = min(1000, max_results)  # PubMed's max per request or user's limit
+        starts = range(0, min(total_count, max_results), batch_size)
         
         print(f"📄 Retrieving up to {max_results} PMIDs...")
         
-        for start in range(0, min(total_count, max_results), batch_size):
-            params = {
-                'db': 'pubmed',
-                'term': query,
-                'retmode': 'xml',
-                'retstart': start,
-                'retmax': min(batch_size, max_results - start),
-                'sort': 'relevance'
-            }
-            
-            if self.email and '@' in self.email and '.' in self.email:
-                params['email'] = self.email
-            
-            try:
-                response = self.session.get(f"{self.base_url}/esearch.fcgi", params=params, timeout=30)
-                response.raise_for_status()
-                
-                if self._is_maintenance_page(response.content) or not self._is_valid_xml_response(response.content):
-                    continue
-                
-                root = ET.fromstring(response.content)
-                batch_pmids = [id_elem.text for id_elem in root.findall('.//IdList/Id')]
-                all_pmids.extend(batch_pmids)
-                
-                print(f"📄 Retrieved PMIDs {start+1}-{start+len(batch_pmids)}")
-                time.sleep(0.1)  # Rate limiting
-                
-            except Exception as e:
-                print(f"❌ Error retrieving batch: {e}")
-                continue
+        with ThreadPoolExecutor(max_workers=self.requests_per_second) as executor:
+            batches = executor.map(
+                lambda start: self._search_batch(query, start, min(batch_size, max_results - start)),
+                starts
+            )
+            all_pmids = [pmid for batch_pmids in batches for pmid in batch_pmids]
         
         print(f"✅ Retrieved {len(all_pmids)} PMIDs")
         return translation, all_pmids, total_count
     
+    def _search_batch(self, query: str, start: int, retmax: int) -> List[str]:
+        """Retrieve one page of PMIDs for a search"""
+        params = {
+            'db': 'pubmed',
+            'term': query,
+            'retmode': 'xml',
+            'retstart': start,
+            'retmax': retmax,
+            'sort': 'relevance'
+        }
+        
+        try:
+            response = self._get("esearch.fcgi", params)
+            
+            if self._is_maintenance_page(response.content) or not self._is_valid_xml_response(response.content):
+                return []
+            
+            batch_pmids = self._xp_ids(ET.fromstring(response.content))
+            print(f"📄 Retrieved PMIDs {start+1}-{start+len(batch_pmids)}")
+            return batch_pmids
+            
+        except Exception as e:
+            print(f"❌ Error retrieving batch: {e}")
+            return []
+    
     def fetch_paper_details(self, pmids: List[str]) -> List[Dict]:
         """
         Fetch detailed information for a list of PMIDs
@@ -136,14 +186,12 @@ class PubMedService:
         
         print(f"📖 Fetching details for {len(pmids)} papers...")
         
-        papers = []
         batch_size = 20  # Process in smaller batches
+        batches = [pmids[i:i + batch_size] for i in range(0, len(pmids), batch_size)]
         
-        for i in range(0, len(pmids), batch_size):
-            batch_pmids = pmids[i:i + batch_size]
-            batch_papers = self._fetch_batch_details(batch_pmids)
-            papers.extend(batch_papers)
-            time.sleep(0.1)  # Rate limiting
+        # Batches are fetched concurrently and collected in PMID order
+        with ThreadPoolExecutor(max_workers=self.requests_per_second) as executor:
+            papers = [paper for batch_papers in executor.map(self._fetch_batch_details, batches) for paper in batch_papers]
         
         print(f"✅ Retrieved details for {len(papers)} papers")
         return papers
@@ -160,20 +208,16 @@ class PubMedService:
             'rettype': 'abstract'
         }
         
-        if self.email and '@' in self.email and '.' in self.email:
-            params['email'] = self.email
-        
         try:
-            response = self.session.get(f"{self.base_url}/efetch.fcgi", params=params, timeout=30)
-            response.raise_for_status()
+            response = self._get("efetch.fcgi", params)
             
             if self._is_maintenance_page(response.content) or not self._is_valid_xml_response(response.content):
                 return []
             
+            # A batch is only 20 articles, so the whole body is parsed at once
             root = ET.fromstring(response.content)
             papers = []
-            
-            for article_elem in root.findall('.//PubmedArticle'):
+            for article_elem in root.iter('PubmedArticle'):
                 paper = self._parse_article_xml(article_elem)
                 if paper:
                     papers.append(paper)
@@ -190,18 +234,18 @@ class PubMedService:
             paper = {}
             
             # Extract PMID
-            pmid_elem = article_elem.find('.//PMID')
-            paper['pmid'] = pmid_elem.text if pmid_elem is not None else 'Unknown'
+            pmids = self._xp_pmid(article_elem)
+            paper['pmid'] = pmids[0] if pmids else 'Unknown'
             
-            # Extract title
-            title_elem = article_elem.find('.//ArticleTitle')
-            paper['title'] = title_elem.text if title_elem is not None else 'No title available'
+            # Extract title, keeping the text inside inline markup such as <i> and <sup>
+            titles = self._xp_title(article_elem)
+            paper['title'] = ''.join(titles[0].itertext()) if titles else 'No title available'
             
             # Extract abstract
             abstract_texts = []
-            for abstract_elem in article_elem.findall('.//AbstractText'):
+            for abstract_elem in self._xp_abstract_texts(article_elem):
                 label = abstract_elem.get('Label', '')
-                text = abstract_elem.text if abstract_elem.text else ''
+                text = ''.join(abstract_elem.itertext())
                 if label:
                     abstract_texts.append(f"{label}: {text}")
                 else:
@@ -211,7 +255,7 @@ class PubMedService:
             
             # Extract authors
             authors = []
-            for author_elem in article_elem.findall('.//Author'):
+            for author_elem in self._xp_authors(article_elem):
                 lastname_elem = author_elem.find('LastName')
                 forename_elem = author_elem.find('ForeName')
                 
@@ -223,12 +267,13 @@ class PubMedService:
             paper['authors'] = ', '.join(authors) if authors else 'Authors not available'
             
             # Extract DOI
-            doi_elem = article_elem.find('.//ELocationID[@EIdType="doi"]')
-            paper['doi'] = doi_elem.text if doi_elem is not None else None
+            dois = self._xp_doi(article_elem)
+            paper['doi'] = dois[0] if dois else None
             
             # Extract publication date
-            pub_date_elem = article_elem.find('.//PubDate')
-            if pub_date_elem is not None:
+            pub_dates = self._xp_pub_date(article_elem)
+            if pub_dates:
+                pub_date_elem = pub_dates[0]
                 year_elem = pub_date_elem.find('Year')
                 month_elem = pub_date_elem.find('Month')
                 day_elem = pub_date_elem.find('Day')
@@ -242,11 +287,7 @@ class PubMedService:
                 paper['publication_date'] = 'Date not available'
             
             # Extract MeSH terms
-            mesh_terms = []
-            for mesh_elem in article_elem.findall('.//MeshHeading/DescriptorName'):
-                if mesh_elem.text:
-                    mesh_terms.append(mesh_elem.text)
-            paper['mesh_terms'] = mesh_terms
+            paper['mesh_terms'] = self._xp_mesh_terms(article_elem)
             
             # Generate PDF link (if DOI is available)
             if paper.get('doi'):
@@ -1,171 +1,315 @@
-import pandas as pd
+import csv
 import os
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Iterable, Optional, Union, BinaryIO
 from datetime import datetime
-import json
-from docx import Document
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
+import orjson
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+# pandas, xlsxwriter, python-docx and reportlab are imported inside the report methods that use
+# them, so starting the app and writing CSV reports never pay to load them
+
+def _truncate(text: Optional[str], length: int) -> str:
+    """Text cut to at most length characters, with '...' only when something was cut"""
+    if not text:
+        return ''
+    return text[:length] + '...' if len(text) > length else text
+
+@lru_cache(maxsize=None)
+def _pdf_styles():
+    """PDF report stylesheet and title style, built once; reports only read them"""
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=30,
+        alignment=1  # Center alignment
+    )
+    return styles, title_style
 
 class ReportService:
+    # Report files are written through a large buffer, so the many small row and zip-entry
+    # writes reach the disk in a few big ones
+    WRITE_BUFFER_SIZE = 1 << 20
+    
     def __init__(self):
         self.reports_dir = "reports"
         os.makedirs(self.reports_dir, exist_ok=True)
     
-    def generate_csv_report(self, question_data: Dict[str, Any], papers_data: List[Dict[str, Any]]) -> str:
+    # CSV report header, in the order csv_row returns each paper's values
+    CSV_COLUMNS = [
+        'PMID', 'Title', 'Authors', 'Publication_Date', 'DOI', 'Score',
+        'Study_Design_Screen', 'Intervention_Screen', 'Population_Screen', 'Outcomes_Screen',
+        'Treatment_Characteristics_Screen',
+        'Study_Design', 'Patient_Characteristics', 'Treatment_Characteristics', 'Intervention',
+        'Comparison', 'Outcomes',
+        'Abstract', 'PDF_Link', 'MeSH_Terms'
+    ]
+    
+    def csv_row(self, paper: Dict[str, Any]) -> tuple:
+        """
+        Flatten one paper into the values of the CSV report columns
+        """
+        extracted_data = paper.get('extracted_data') or {}
+        screening_data = paper.get('screening_json') or {}
+        abstract = paper.get('abstract')
+        mesh_terms = paper.get('mesh_terms')
+        
+        return (
+            paper.get('pmid', ''),
+            paper.get('title', ''),
+            paper.get('authors', ''),
+            paper.get('publication_date', ''),
+            paper.get('doi', ''),
+            paper.get('score', 0.0),
+            
+            # Screening results
+            screening_data.get('study_design', ''),
+            screening_data.get('intervention', ''),
+            screening_data.get('population', ''),
+            screening_data.get('outcomes', ''),
+            screening_data.get('treatment_characteristics', ''),
+            
+            # Extracted data
+            extracted_data.get('study_design', ''),
+            extracted_data.get('patient_characteristics', ''),
+            extracted_data.get('treatment_characteristics', ''),
+            extracted_data.get('intervention', ''),
+            extracted_data.get('comparison', ''),
+            extracted_data.get('outcomes', ''),
+            
+            # Metadata
+            abstract[:500] + '...' if abstract else '',
+            paper.get('pdf_link', ''),
+            ', '.join(mesh_terms) if isinstance(mesh_terms, list) else ''
+        )
+    
+    # Full paper data file written next to an Excel report, in the order full_data_row returns them
+    FULL_DATA_COLUMNS = [
+        'PMID', 'Title', 'Authors', 'Publication_Date', 'DOI', 'Score', 'Abstract', 'PDF_Link', 'MeSH_Terms'
+    ]
+    
+    def full_data_row(self, paper: Dict[str, Any]) -> tuple:
         """
-        Generate CSV report from extracted data
+        Flatten one paper into the values of the full paper data columns
+        """
+        mesh_terms = paper.get('mesh_terms')
+        
+        return (
+            paper.get('pmid', ''),
+            paper.get('title', ''),
+            paper.get('authors', ''),
+            paper.get('publication_date', ''),
+            paper.get('doi', ''),
+            paper.get('score', 0.0),
+            paper.get('abstract', ''),
+            paper.get('pdf_link', ''),
+            ', '.join(mesh_terms) if isinstance(mesh_terms, list) else ''
+        )
+    
+    def _papers_with_data(self, papers_data: List[Dict[str, Any]]):
+        """
+        Split papers into those with screening data and those with extracted data, and average
+        their scores, in one pass
+        """
+        screened, extracted = [], []
+        score_total = 0.0
+        for paper in papers_data:
+            if paper.get('screening_json'):
+                screened.append(paper)
+            if paper.get('extracted_data'):
+                extracted.append(paper)
+            score_total += paper.get('score') or 0
+        avg_score = score_total / len(papers_data) if papers_data else 0
+        return screened, extracted, avg_score
+    
+    def generate_csv_report(self, question_data: Dict[str, Any], papers_data: Iterable[Dict[str, Any]]) -> str:
+        """
+        Generate CSV report from extracted data, writing each paper as it arrives
         """
         try:
-            # Prepare data for CSV
-            report_data = []
+            filename, filepath = self._new_report_path(question_data, 'csv')
             
-            for paper in papers_data:
-                extracted_data = paper.get('extracted_data') or {}
-                screening_data = paper.get('screening_json') or {}
-                
-                row = {
-                    'PMID': paper.get('pmid', ''),
-                    'Title': paper.get('title', ''),
-                    'Authors': paper.get('authors', ''),
-                    'Publication_Date': paper.get('publication_date', ''),
-                    'DOI': paper.get('doi', ''),
-                    'Score': paper.get('score', 0.0),
-                    
-                    # Screening results
-                    'Study_Design_Screen': screening_data.get('study_design', ''),
-                    'Intervention_Screen': screening_data.get('intervention', ''),
-                    'Population_Screen': screening_data.get('population', ''),
-                    'Outcomes_Screen': screening_data.get('outcomes', ''),
-                    'Treatment_Characteristics_Screen': screening_data.get('treatment_characteristics', ''),
-                    
-                    # Extracted data
-                    'Study_Design': extracted_data.get('study_design', ''),
-                    'Patient_Characteristics': extracted_data.get('patient_characteristics', ''),
-                    'Treatment_Characteristics': extracted_data.get('treatment_characteristics', ''),
-                    'Intervention': extracted_data.get('intervention', ''),
-                    'Comparison': extracted_data.get('comparison', ''),
-                    'Outcomes': extracted_data.get('outcomes', ''),
-                    
-                    # Metadata
-                    'Abstract': (paper.get('abstract', '') or '')[:500] + '...' if paper.get('abstract') else '',
-                    'PDF_Link': paper.get('pdf_link', ''),
-                    'MeSH_Terms': ', '.join(paper.get('mesh_terms', []) if isinstance(paper.get('mesh_terms'), list) else [])
-                }
-                report_data.append(row)
+            # Save CSV one row at a time, so papers can be streamed in from the database
+            with open(filepath, 'w', newline='', encoding='utf-8', buffering=self.WRITE_BUFFER_SIZE) as f:
+                writer = csv.writer(f, lineterminator='\n')
+                writer.writerow(self.CSV_COLUMNS)
+                writer.writerows(self.csv_row(paper) for paper in papers_data)
             
-            # Create DataFrame
-            df = pd.DataFrame(report_data)
+            return filename
             
-            # Generate filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            question_id = question_data.get('id', 'unknown')
-            filename = f"meta_analysis_report_{question_id}_{timestamp}.csv"
-            filepath = os.path.join(self.reports_dir, filename)
+        except Exception as e:
+            raise Exception(f"Error generating CSV report: {str(e)}")
+    
+    def generate_parquet_report(self, question_data: Dict[str, Any], papers_data: Iterable[Dict[str, Any]]) -> str:
+        """
+        Generate a Parquet report with the CSV report's columns, compressed and typed for analysis tools
+        """
+        try:
+            import pandas as pd
+            
+            filename, filepath = self._new_report_path(question_data, 'parquet')
             
-            # Save CSV
-            df.to_csv(filepath, index=False, encoding='utf-8')
+            report_df = pd.DataFrame.from_records(
+                [self.csv_row(paper) for paper in papers_data], columns=self.CSV_COLUMNS
+            )
+            report_df.to_parquet(filepath, engine='pyarrow', compression='snappy', index=False)
             
             return filename
             
         except Exception as e:
-            raise Exception(f"Error generating CSV report: {str(e)}")
+            raise Exception(f"Error generating Parquet report: {str(e)}")
     
     def generate_excel_report(self, question_data: Dict[str, Any], papers_data: List[Dict[str, Any]]) -> str:
         """
         Generate Excel report with multiple sheets
+        
+        Every paper's full record, abstract included, goes to a Parquet file named to match the
+        workbook, which the Summary sheet points to; it is too wide to be worth a sheet of its own.
         """
+        filename, filepath = self._new_report_path(question_data, 'xlsx')
+        full_data_filename = self._full_data_filename(filename)
+        full_data_path = os.path.join(self.reports_dir, full_data_filename)
+        
         try:
-            # Generate filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            question_id = question_data.get('id', 'unknown')
-            filename = f"meta_analysis_report_{question_id}_{timestamp}.xlsx"
-            filepath = os.path.join(self.reports_dir, filename)
+            import pandas as pd
             
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                # Sheet 1: Summary
-                summary_data = {
-                    'Research Question': [question_data.get('original_text', '')],
-                    'Rephrased Question': [question_data.get('rephrased_text', '')],
-                    'Total Papers Found': [len(papers_data)],
-                    'Average Score': [sum(p.get('score', 0) for p in papers_data) / len(papers_data) if papers_data else 0],
-                    'Report Generated': [datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
-                    'PICO Criteria': [json.dumps(question_data.get('pico_json', {}), indent=2)]
-                }
-                summary_df = pd.DataFrame(summary_data)
-                summary_df.to_excel(writer, sheet_name='Summary', index=False)
-                
-                # Sheet 2: Screening Results
-                screening_data = []
-                for paper in papers_data:
-                    screening_json = paper.get('screening_json', {})
-                    row = {
-                        'PMID': paper.get('pmid', ''),
-                        'Title': paper.get('title', '')[:100] + '...' if paper.get('title') else '',
-                        'Score': paper.get('score', 0.0),
-                        'Study_Design': screening_json.get('study_design', ''),
-                        'Intervention': screening_json.get('intervention', ''),
-                        'Population': screening_json.get('population', ''),
-                        'Outcomes': screening_json.get('outcomes', ''),
-                        'Treatment_Characteristics': screening_json.get('treatment_characteristics', '')
-                    }
-                    screening_data.append(row)
-                
-                screening_df = pd.DataFrame(screening_data)
-                screening_df.to_excel(writer, sheet_name='Screening Results', index=False)
-                
-                # Sheet 3: Extracted Data
-                extraction_data = []
-                for paper in papers_data:
-                    extracted_data = paper.get('extracted_data', {})
-                    if extracted_data:  # Only include papers with extracted data
-                        row = {
-                            'PMID': paper.get('pmid', ''),
-                            'Title': paper.get('title', '')[:100] + '...' if paper.get('title') else '',
-                            'Authors': paper.get('authors', ''),
-                            'Publication_Date': paper.get('publication_date', ''),
-                            'Study_Design': extracted_data.get('study_design', ''),
-                            'Patient_Characteristics': extracted_data.get('patient_characteristics', ''),
-                            'Treatment_Characteristics': extracted_data.get('treatment_characteristics', ''),
-                            'Intervention': extracted_data.get('intervention', ''),
-                            'Comparison': extracted_data.get('comparison', ''),
-                            'Outcomes': extracted_data.get('outcomes', '')
-                        }
-                        extraction_data.append(row)
-                
-                if extraction_data:
-                    extraction_df = pd.DataFrame(extraction_data)
-                    extraction_df.to_excel(writer, sheet_name='Extracted Data', index=False)
+            full_data_df = pd.DataFrame.from_records(
+                [self.full_data_row(paper) for paper in papers_data], columns=self.FULL_DATA_COLUMNS
+            )
+            full_data_df.to_parquet(full_data_path, engine='pyarrow', compression='snappy', index=False)
+        except Exception as e:
+            raise Exception(f"Error generating Excel report: {str(e)}")
+        
+        try:
+            with open(filepath, 'wb', buffering=self.WRITE_BUFFER_SIZE) as f:
+                self.write_excel_report(f, question_data, papers_data, full_data_filename)
+        except Exception:
+            # Neither a partial workbook nor the records it would have pointed to are kept
+            for path in (filepath, full_data_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        return filename
+    
+    def _full_data_filename(self, filename: str) -> str:
+        """Name of the Parquet file holding the full records behind an Excel report"""
+        stem = os.path.splitext(filename)[0].replace('meta_analysis_report_', 'meta_analysis_full_', 1)
+        return f"{stem}.parquet"
+    
+    def write_excel_report(self, target: Union[str, BinaryIO], question_data: Dict[str, Any], papers_data: List[Dict[str, Any]],
+                           full_data_filename: Optional[str] = None) -> None:
+        """
+        Write the Excel report sheets to a file path or an in-memory binary buffer
+        
+        The workbook is written in constant-memory mode, flushing each row to disk as the next
+        one starts, so a large report never holds a whole sheet in memory. The Summary sheet
+        names full_data_filename, when given, as the file holding every paper's full record.
+        """
+        try:
+            import xlsxwriter
+            
+            workbook = xlsxwriter.Workbook(target, {
+                'constant_memory': True,
+                # Paper text is data, never a link or formula to evaluate
+                'strings_to_urls': False,
+                'strings_to_formulas': False
+            })
+            header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+            
+            try:
+                # Sheets are added in tab order, then filled together in one pass over the papers;
+                # constant-memory mode only needs each sheet's own rows to arrive in order
+                summary_columns = [
+                    'Research Question', 'Rephrased Question', 'Total Papers Found', 'Average Score',
+                    'Report Generated', 'PICO Criteria'
+                ]
+                if full_data_filename:
+                    summary_columns.append('Full Paper Data')
+                summary_sheet = self._add_sheet(workbook, header_format, 'Summary', summary_columns)
+                screening_sheet = self._add_sheet(workbook, header_format, 'Screening Results', [
+                    'PMID', 'Title', 'Score', 'Study_Design', 'Intervention', 'Population', 'Outcomes',
+                    'Treatment_Characteristics'
+                ])
+                # Extracted Data only appears when some paper has extracted data
+                extraction_sheet = None
+                if any(paper.get('extracted_data') for paper in papers_data):
+                    extraction_sheet = self._add_sheet(workbook, header_format, 'Extracted Data', [
+                        'PMID', 'Title', 'Authors', 'Publication_Date', 'Study_Design', 'Patient_Characteristics',
+                        'Treatment_Characteristics', 'Intervention', 'Comparison', 'Outcomes'
+                    ])
                 
-                # Sheet 4: Full Data
-                full_data = []
-                for paper in papers_data:
-                    row = {
-                        'PMID': paper.get('pmid', ''),
-                        'Title': paper.get('title', ''),
-                        'Authors': paper.get('authors', ''),
-                        'Publication_Date': paper.get('publication_date', ''),
-                        'DOI': paper.get('doi', ''),
-                        'Score': paper.get('score', 0.0),
-                        'Abstract': paper.get('abstract', ''),
-                        'PDF_Link': paper.get('pdf_link', ''),
-                        'MeSH_Terms': ', '.join(paper.get('mesh_terms', []) if isinstance(paper.get('mesh_terms'), list) else [])
-                    }
-                    full_data.append(row)
+                score_total = 0.0
+                extraction_row = 0
+                for row_number, paper in enumerate(papers_data, start=1):
+                    pmid = paper.get('pmid', '')
+                    # Cut once, shared by the Screening Results and Extracted Data rows
+                    short_title = _truncate(paper.get('title'), 100)
+                    score = paper.get('score', 0.0)
+                    score_total += score or 0
+                    
+                    screening_json = paper.get('screening_json') or {}
+                    screening_sheet.write_row(row_number, 0, (
+                        pmid,
+                        short_title,
+                        score,
+                        screening_json.get('study_design', ''),
+                        screening_json.get('intervention', ''),
+                        screening_json.get('population', ''),
+                        screening_json.get('outcomes', ''),
+                        screening_json.get('treatment_characteristics', '')
+                    ))
+                    
+                    extracted_data = paper.get('extracted_data')
+                    if extracted_data:
+                        extraction_row += 1
+                        extraction_sheet.write_row(extraction_row, 0, (
+                            pmid,
+                            short_title,
+                            paper.get('authors', ''),
+                            paper.get('publication_date', ''),
+                            extracted_data.get('study_design', ''),
+                            extracted_data.get('patient_characteristics', ''),
+                            extracted_data.get('treatment_characteristics', ''),
+                            extracted_data.get('intervention', ''),
+                            extracted_data.get('comparison', ''),
+                            extracted_data.get('outcomes', '')
+                        ))
                 
-                full_df = pd.DataFrame(full_data)
-                full_df.to_excel(writer, sheet_name='Full Paper Data', index=False)
-            
-            return filename
+                summary_row = [
+                    question_data.get('original_text', ''),
+                    question_data.get('rephrased_text', ''),
+                    len(papers_data),
+                    score_total / len(papers_data) if papers_data else 0,
+                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    orjson.dumps(question_data.get('pico_json', {}), option=orjson.OPT_INDENT_2).decode()
+                ]
+                if full_data_filename:
+                    summary_row.append(full_data_filename)
+                summary_sheet.write_row(1, 0, summary_row)
+            finally:
+                workbook.close()
             
         except Exception as e:
             raise Exception(f"Error generating Excel report: {str(e)}")
     
+    def _add_sheet(self, workbook, header_format, name: str, columns: List[str]):
+        """Add a worksheet with its header row written"""
+        worksheet = workbook.add_worksheet(name)
+        worksheet.write_row(0, 0, columns, header_format)
+        return worksheet
+    
+    def _new_report_path(self, question_data: Dict[str, Any], extension: str):
+        """Timestamped filename and full path for a new report on a question"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        question_id = question_data.get('id', 'unknown')
+        filename = f"meta_analysis_report_{question_id}_{timestamp}.{extension}"
+        return filename, os.path.join(self.reports_dir, filename)
+    
     def get_report_path(self, filename: str) -> str:
         """Get full path to report file"""
         return os.path.join(self.reports_dir, filename)
@@ -173,26 +317,38 @@ class ReportService:
     def list_reports(self) -> List[str]:
         """List all generated reports"""
         try:
-            reports = []
-            for filename in os.listdir(self.reports_dir):
-                if filename.endswith(('.csv', '.xlsx', '.docx', '.pdf')):
-                    filepath = os.path.join(self.reports_dir, filename)
-                    stats = os.stat(filepath)
-                    reports.append({
-                        'filename': filename,
-                        'size': stats.st_size,
-                        'created': datetime.fromtimestamp(stats.st_ctime).strftime("%Y-%m-%d %H:%M:%S")
-                    })
-            return sorted(reports, key=lambda x: x['created'], reverse=True)
+            # scandir hands back each entry's stat with the listing, so there is no
+            # separate stat call per report
+            entries = []
+            with os.scandir(self.reports_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(('.csv', '.parquet', '.xlsx', '.docx', '.pdf')):
+                        stats = entry.stat()
+                        entries.append((stats.st_ctime, entry.name, stats.st_size))
+            
+            # Newest first, sorted on the raw timestamps before any are formatted
+            entries.sort(reverse=True)
+            return [
+                {
+                    'filename': filename,
+                    'size': size,
+                    'created': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ctime))
+                }
+                for ctime, filename, size in entries
+            ]
         except Exception as e:
             raise Exception(f"Error listing reports: {str(e)}")
     
     def delete_report(self, filename: str) -> bool:
-        """Delete a report file"""
+        """Delete a report file, along with the full-records file of an Excel report"""
         try:
             filepath = os.path.join(self.reports_dir, filename)
             if os.path.exists(filepath):
                 os.remove(filepath)
+                if filename.startswith('meta_analysis_report_') and filename.endswith('.xlsx'):
+                    full_data_path = os.path.join(self.reports_dir, self._full_data_filename(filename))
+                    if os.path.exists(full_data_path):
+                        os.remove(full_data_path)
                 return True
             return False
         except Exception as e:
@@ -203,6 +359,11 @@ class ReportService:
         Generate Word (DOCX) report from extracted data
         """
         try:
+            from docx import Document
+            from docx.enum.text import WD_ALIGN_PARAGRAPH
+            from docx.oxml import parse_xml
+            from docx.oxml.ns import nsdecls, qn
+            
             # Create a new document
             doc = Document()
             
@@ -225,19 +386,18 @@ class ReportService:
                 doc.add_paragraph(f"• Comparison: {pico.get('comparison', 'Not specified')}")
                 doc.add_paragraph(f"• Outcome: {pico.get('outcome', 'Not specified')}")
             
+            screened_papers, extracted_papers, avg_score = self._papers_with_data(papers_data)
+            
             # Add summary statistics
             doc.add_page_break()
             doc.add_heading('Summary Statistics', level=1)
             doc.add_paragraph(f"Total Papers Found: {len(papers_data)}")
-            avg_score = sum(p.get('score', 0) for p in papers_data) / len(papers_data) if papers_data else 0
             doc.add_paragraph(f"Average Screening Score: {avg_score:.2f}")
-            screened_count = len([p for p in papers_data if p.get('screening_json')])
-            doc.add_paragraph(f"Papers Screened: {screened_count}")
-            extracted_count = len([p for p in papers_data if p.get('extracted_data')])
-            doc.add_paragraph(f"Papers with Extracted Data: {extracted_count}")
+            doc.add_paragraph(f"Papers Screened: {len(screened_papers)}")
+            doc.add_paragraph(f"Papers with Extracted Data: {len(extracted_papers)}")
             
             # Add screening results section
-            if any(p.get('screening_json') for p in papers_data):
+            if screened_papers:
                 doc.add_page_break()
                 doc.add_heading('Screening Results', level=1)
                 
@@ -255,87 +415,102 @@ class ReportService:
                         for run in paragraph.runs:
                             run.bold = True
                 
-                # Add data rows
+                # Add data rows, built as XML and parsed in one go rather than cell by cell
+                widths = [grid_col.get(qn('w:w')) for grid_col in table._tbl.tblGrid.gridCol_lst]
+                rows_xml = []
                 for paper in papers_data[:20]:  # Limit to first 20 papers
-                    if paper.get('screening_json'):
-                        row_cells = table.add_row().cells
-                        screening = paper.get('screening_json', {})
-                        
-                        row_cells[0].text = paper.get('pmid', '')
-                        row_cells[1].text = (paper.get('title', '')[:50] + '...') if paper.get('title') else ''
-                        row_cells[2].text = f"{paper.get('score', 0):.1f}"
-                        row_cells[3].text = screening.get('study_design', '')
-                        row_cells[4].text = screening.get('intervention', '')
-                        row_cells[5].text = screening.get('population', '')
-                        row_cells[6].text = screening.get('outcomes', '')
+                    screening = paper.get('screening_json')
+                    if screening:
+                        rows_xml.append(self._docx_row_xml(widths, (
+                            paper.get('pmid', ''),
+                            _truncate(paper.get('title'), 50),
+                            f"{paper.get('score', 0):.1f}",
+                            screening.get('study_design', ''),
+                            screening.get('intervention', ''),
+                            screening.get('population', ''),
+                            screening.get('outcomes', '')
+                        )))
+                table._tbl.extend(parse_xml(f'<w:tbl {nsdecls("w")}>{"".join(rows_xml)}</w:tbl>'))
             
             # Add extracted data section
-            if any(p.get('extracted_data') for p in papers_data):
+            if extracted_papers:
                 doc.add_page_break()
                 doc.add_heading('Extracted Data', level=1)
                 
-                for paper in papers_data:
-                    if paper.get('extracted_data'):
-                        extracted = paper.get('extracted_data', {})
-                        
-                        # Paper heading
-                        doc.add_heading(f"PMID: {paper.get('pmid', '')}", level=2)
-                        doc.add_paragraph(f"Title: {paper.get('title', '')}")
-                        doc.add_paragraph(f"Authors: {paper.get('authors', '')}")
-                        doc.add_paragraph(f"Publication Date: {paper.get('publication_date', '')}")
-                        
-                        # Extracted information
-                        doc.add_heading('Study Details', level=3)
-                        doc.add_paragraph(f"Study Design: {extracted.get('study_design', 'Not specified')}")
-                        doc.add_paragraph(f"Patient Characteristics: {extracted.get('patient_characteristics', 'Not specified')}")
-                        doc.add_paragraph(f"Treatment Characteristics: {extracted.get('treatment_characteristics', 'Not specified')}")
-                        doc.add_paragraph(f"Intervention: {extracted.get('intervention', 'Not specified')}")
-                        doc.add_paragraph(f"Comparison: {extracted.get('comparison', 'Not specified')}")
-                        doc.add_paragraph(f"Outcomes: {extracted.get('outcomes', 'Not specified')}")
-                        
-                        doc.add_paragraph()  # Add spacing
+                for paper in extracted_papers:
+                    extracted = paper['extracted_data']
+                    
+                    # Paper heading
+                    doc.add_heading(f"PMID: {paper.get('pmid', '')}", level=2)
+                    doc.add_paragraph(f"Title: {paper.get('title', '')}")
+                    doc.add_paragraph(f"Authors: {paper.get('authors', '')}")
+                    doc.add_paragraph(f"Publication Date: {paper.get('publication_date', '')}")
+                    
+                    # Extracted information
+                    doc.add_heading('Study Details', level=3)
+                    doc.add_paragraph(f"Study Design: {extracted.get('study_design', 'Not specified')}")
+                    doc.add_paragraph(f"Patient Characteristics: {extracted.get('patient_characteristics', 'Not specified')}")
+                    doc.add_paragraph(f"Treatment Characteristics: {extracted.get('treatment_characteristics', 'Not specified')}")
+                    doc.add_paragraph(f"Intervention: {extracted.get('intervention', 'Not specified')}")
+                    doc.add_paragraph(f"Comparison: {extracted.get('comparison', 'Not specified')}")
+                    doc.add_paragraph(f"Outcomes: {extracted.get('outcomes', 'Not specified')}")
+                    
+                    doc.add_paragraph()  # Add spacing
             
             # Add references section
             doc.add_page_break()
             doc.add_heading('References', level=1)
             
             for i, paper in enumerate(papers_data, 1):
-                if paper.get('title'):
+                title = paper.get('title')
+                if title:
+                    authors = paper.get('authors')
+                    publication_date = paper.get('publication_date')
+                    doi = paper.get('doi')
+                    pmid = paper.get('pmid')
+                    
                     ref_text = f"{i}. "
-                    if paper.get('authors'):
-                        ref_text += f"{paper['authors']}. "
-                    ref_text += f"{paper['title']} "
-                    if paper.get('publication_date'):
-                        ref_text += f"({paper['publication_date']}). "
-                    if paper.get('doi'):
-                        ref_text += f"DOI: {paper['doi']}"
-                    elif paper.get('pmid'):
-                        ref_text += f"PMID: {paper['pmid']}"
+                    if authors:
+                        ref_text += f"{authors}. "
+                    ref_text += f"{title} "
+                    if publication_date:
+                        ref_text += f"({publication_date}). "
+                    if doi:
+                        ref_text += f"DOI: {doi}"
+                    elif pmid:
+                        ref_text += f"PMID: {pmid}"
                     
                     doc.add_paragraph(ref_text)
             
-            # Generate filename and save
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            question_id = question_data.get('id', 'unknown')
-            filename = f"meta_analysis_report_{question_id}_{timestamp}.docx"
-            filepath = os.path.join(self.reports_dir, filename)
+            filename, filepath = self._new_report_path(question_data, 'docx')
             
-            doc.save(filepath)
+            with open(filepath, 'wb', buffering=self.WRITE_BUFFER_SIZE) as f:
+                doc.save(f)
             return filename
             
         except Exception as e:
             raise Exception(f"Error generating Word report: {str(e)}")
     
+    def _docx_row_xml(self, widths: List[str], values: Iterable[str]) -> str:
+        """XML for a Word table row with one single-paragraph cell per value"""
+        cells = ''.join(
+            f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr>'
+            f'<w:p><w:r><w:t xml:space="preserve">{escape(value)}</w:t></w:r></w:p></w:tc>'
+            for width, value in zip(widths, values)
+        )
+        return f'<w:tr>{cells}</w:tr>'
+    
     def generate_pdf_report(self, question_data: Dict[str, Any], papers_data: List[Dict[str, Any]]) -> str:
         """
         Generate PDF report from extracted data
         """
         try:
-            # Generate filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            question_id = question_data.get('id', 'unknown')
-            filename = f"meta_analysis_report_{question_id}_{timestamp}.pdf"
-            filepath = os.path.join(self.reports_dir, filename)
+            from reportlab.lib import colors
+            from reportlab.lib.pagesizes import letter
+            from reportlab.lib.units import inch
+            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+            
+            filename, filepath = self._new_report_path(question_data, 'pdf')
             
             # Create PDF document
             doc = SimpleDocTemplate(filepath, pagesize=letter,
@@ -346,14 +521,7 @@ class ReportService:
             elements = []
             
             # Define styles
-            styles = getSampleStyleSheet()
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=24,
-                spaceAfter=30,
-                alignment=1  # Center alignment
-            )
+            styles, title_style = _pdf_styles()
             
             # Add title
             elements.append(Paragraph("Meta-Analysis Report", title_style))
@@ -386,15 +554,17 @@ class ReportService:
                 elements.append(pico_table)
                 elements.append(Spacer(1, 0.3*inch))
             
+            screened_papers, extracted_papers, avg_score = self._papers_with_data(papers_data)
+            
             # Add summary statistics
             elements.append(PageBreak())
             elements.append(Paragraph("Summary Statistics", styles['Heading2']))
             
             stats_data = [
                 ['Total Papers Found:', str(len(papers_data))],
-                ['Average Screening Score:', f"{sum(p.get('score', 0) for p in papers_data) / len(papers_data) if papers_data else 0:.2f}"],
-                ['Papers Screened:', str(len([p for p in papers_data if p.get('screening_json')]))],
-                ['Papers with Extracted Data:', str(len([p for p in papers_data if p.get('extracted_data')]))]
+                ['Average Screening Score:', f"{avg_score:.2f}"],
+                ['Papers Screened:', str(len(screened_papers))],
+                ['Papers with Extracted Data:', str(len(extracted_papers))]
             ]
             
             stats_table = Table(stats_data, colWidths=[3*inch, 3*inch])
@@ -408,7 +578,7 @@ class ReportService:
             elements.append(stats_table)
             
             # Add screening results
-            if any(p.get('screening_json') for p in papers_data):
+            if screened_papers:
                 elements.append(PageBreak())
                 elements.append(Paragraph("Screening Results", styles['Heading2']))
                 elements.append(Spacer(1, 0.1*inch))
@@ -417,8 +587,8 @@ class ReportService:
                 screening_data = [['PMID', 'Score', 'Study Design', 'Intervention', 'Population']]
                 
                 for paper in papers_data[:15]:  # Limit to first 15 papers
-                    if paper.get('screening_json'):
-                        screening = paper.get('screening_json', {})
+                    screening = paper.get('screening_json')
+                    if screening:
                         screening_data.append([
                             paper.get('pmid', '')[:10],
                             f"{paper.get('score', 0):.1f}",
@@ -440,28 +610,25 @@ class ReportService:
                 elements.append(screening_table)
             
             # Add top extracted papers
-            if any(p.get('extracted_data') for p in papers_data):
+            if extracted_papers:
                 elements.append(PageBreak())
                 elements.append(Paragraph("Key Extracted Data", styles['Heading2']))
                 
-                count = 0
-                for paper in papers_data:
-                    if paper.get('extracted_data') and count < 5:  # Limit to top 5
-                        count += 1
-                        extracted = paper.get('extracted_data', {})
-                        
-                        elements.append(Spacer(1, 0.2*inch))
-                        elements.append(Paragraph(f"<b>Paper {count} - PMID: {paper.get('pmid', '')}</b>", styles['Heading3']))
-                        
-                        # Create a condensed summary
-                        summary_text = f"""
-                        <b>Title:</b> {paper.get('title', '')[:100]}...<br/>
-                        <b>Study Design:</b> {extracted.get('study_design', 'Not specified')[:100]}...<br/>
-                        <b>Intervention:</b> {extracted.get('intervention', 'Not specified')[:100]}...<br/>
-                        <b>Outcomes:</b> {extracted.get('outcomes', 'Not specified')[:100]}...
-                        """
-                        
-                        elements.append(Paragraph(summary_text, styles['Normal']))
+                for count, paper in enumerate(extracted_papers[:5], 1):  # Limit to top 5
+                    extracted = paper['extracted_data']
+                    
+                    elements.append(Spacer(1, 0.2*inch))
+                    elements.append(Paragraph(f"<b>Paper {count} - PMID: {paper.get('pmid', '')}</b>", styles['Heading3']))
+                    
+                    # Create a condensed summary
+                    summary_text = f"""
+                    <b>Title:</b> {_truncate(paper.get('title'), 100)}<br/>
+                    <b>Study Design:</b> {_truncate(extracted.get('study_design') or 'Not specified', 100)}<br/>
+                    <b>Intervention:</b> {_truncate(extracted.get('intervention') or 'Not specified', 100)}<br/>
+                    <b>Outcomes:</b> {_truncate(extracted.get('outcomes') or 'Not specified', 100)}
+                    """
+                    
+                    elements.append(Paragraph(summary_text, styles['Normal']))
             
             # Build PDF
             doc.build(elements)
@@ -1,17 +1,16 @@
 from fastapi import Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 import logging
 from typing import Union
-import traceback
 
 logger = logging.getLogger("meta_analysis_api")
 
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Handle validation errors"""
     logger.error(f"Validation error for {request.url}: {exc.errors()}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=422,
         content={
             "error": "Validation Error",
@@ -23,7 +22,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 async def http_exception_handler(request: Request, exc: Union[HTTPException, StarletteHTTPException]):
     """Handle HTTP exceptions"""
     logger.error(f"HTTP error for {request.url}: {exc.detail}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "error": "HTTP Error",
@@ -34,15 +33,16 @@ async def http_exception_handler(request: Request, exc: Union[HTTPException, Sta
 
 async def general_exception_handler(request: Request, exc: Exception):
     """Handle general exceptions"""
-    logger.error(f"Unexpected error for {request.url}: {str(exc)}")
-    logger.error(f"Traceback: {traceback.format_exc()}")
+    # One record with the traceback attached; the root QueueHandler formats it on this
+    # thread before queueing, so only the file and console writes leave the request
+    logger.error("Unexpected error for %s: %s", request.url, exc, exc_info=exc)
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "error": "Internal Server Error",
             "message": "An unexpected error occurred. Please try again later.",
-            "detail": str(exc) if logger.level == logging.DEBUG else "Internal server error"
+            "detail": str(exc) if logger.isEnabledFor(logging.DEBUG) else "Internal server error"
         }
     )
 
@@ -0,0 +1,35 @@
+from fastapi import Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Paper
+from typing import Optional
+import hashlib
+import uuid
+
+CACHE_CONTROL = "private, max-age=30"
+
+def _paper_version(question_id: uuid.UUID):
+    """Newest modification time and row count of a question's papers"""
+    return select(
+        func.max(Paper.updated_at), func.count(Paper.id)
+    ).where(Paper.question_id == question_id)
+
+def version_etag(question_id: uuid.UUID, last_updated, paper_count: int, request: Request) -> str:
+    """ETag for a question's papers at a given newest modification time and row count"""
+    # Query parameters (score filters, paging) select different views of the same papers
+    key = f"{question_id}:{last_updated}:{paper_count}:{request.url.query}"
+    return f'"{hashlib.md5(key.encode()).hexdigest()}"'
+
+async def paper_etag_async(db: AsyncSession, question_id: uuid.UUID, request: Request) -> str:
+    """ETag for a question's paper listings; changes when any of its papers is added or modified"""
+    last_updated, paper_count = (await db.execute(_paper_version(question_id))).one()
+    return version_etag(question_id, last_updated, paper_count, request)
+
+def conditional_response(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Return a 304 when the client already has this version, otherwise tag the response"""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    response.headers.update(headers)
+    return None
@@ -1,10 +1,15 @@
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 from datetime import datetime
 import os
+from functools import lru_cache
 
+@lru_cache(maxsize=None)
 def setup_logging():
-    """Setup logging configuration"""
+    """Setup logging configuration (once; later calls return the same logger)"""
     
     # Create logs directory if it doesn't exist
     os.makedirs("logs", exist_ok=True)
@@ -14,9 +19,11 @@ def setup_logging():
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
     
-    # Setup file handler
+    # Setup file handler, rolled over to a numbered backup once it reaches 64 MiB
     log_filename = f"logs/meta_analysis_api_{datetime.now().strftime('%Y%m%d')}.log"
-    file_handler = logging.FileHandler(log_filename)
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_filename, maxBytes=64 * 1024 * 1024, backupCount=7, encoding='utf-8'
+    )
     file_handler.setLevel(logging.INFO)
     file_handler.setFormatter(formatter)
     
@@ -25,11 +32,19 @@ def setup_logging():
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
     
+    # Log calls only put records on a queue; a listener thread does the file and console writes,
+    # so requests never wait on log I/O. Records still queued are written out at exit
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+    
     # Setup root logger
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
     
     # Setup specific loggers
     api_logger = logging.getLogger("meta_analysis_api")
@@ -0,0 +1,36 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import ResearchQuestion
+from collections import OrderedDict
+from typing import Optional, Tuple
+import time
+import uuid
+
+# Research questions are never edited after creation, so a short-lived copy is safe to serve
+QUESTION_CACHE_SIZE = 1024
+QUESTION_CACHE_TTL = 300  # seconds
+
+_questions: "OrderedDict[uuid.UUID, Tuple[float, ResearchQuestion]]" = OrderedDict()
+
+def remember_question(question: ResearchQuestion):
+    """Cache a loaded research question; it is detached from its session first"""
+    _questions[question.id] = (time.monotonic() + QUESTION_CACHE_TTL, question)
+    _questions.move_to_end(question.id)
+    while len(_questions) > QUESTION_CACHE_SIZE:
+        _questions.popitem(last=False)
+
+def forget_question(question_id: uuid.UUID):
+    """Drop a research question from the cache, e.g. after it changes"""
+    _questions.pop(question_id, None)
+
+async def get_question(db: AsyncSession, question_id: uuid.UUID) -> Optional[ResearchQuestion]:
+    """Research question by id, from the cache when a fresh copy is held"""
+    entry = _questions.get(question_id)
+    if entry and entry[0] > time.monotonic():
+        _questions.move_to_end(question_id)
+        return entry[1]
+    
+    question = await db.get(ResearchQuestion, question_id)
+    if question is not None:
+        db.expunge(question)
+        remember_question(question)
+    return question
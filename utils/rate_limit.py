@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+class RateLimiter:
+    """Client-side request and token budgets per minute, refilled continuously"""
+    
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = requests_per_minute
+        self._tokens = tokens_per_minute
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        """Top the budgets up for the time since they were last spent"""
+        now = time.monotonic()
+        elapsed_minutes = (now - self._updated) / 60
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed_minutes * self.requests_per_minute)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed_minutes * self.tokens_per_minute)
+    
+    async def acquire(self, tokens: int):
+        """Wait until one request of about this many tokens fits in the budgets, then spend it"""
+        # A request bigger than the whole token budget only waits for a full bucket
+        tokens = min(tokens, self.tokens_per_minute)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                
+                wait_minutes = max(
+                    (1 - self._requests) / self.requests_per_minute,
+                    (tokens - self._tokens) / self.tokens_per_minute
+                )
+                await asyncio.sleep(wait_minutes * 60)